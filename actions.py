@@ -0,0 +1,307 @@
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Command for each system action, per operating system
+ACTION_COMMANDS = {
+    "Windows": {
+        'shutdown': ['shutdown', '/s', '/t', '1'],
+        'restart': ['shutdown', '/r', '/t', '1'],
+        'sleep': ['rundll32.exe', 'powrprof.dll,SetSuspendState', '0,1,0']
+    },
+    "Linux": {
+        'shutdown': ['shutdown', '-h', 'now'],
+        'restart': ['shutdown', '-r', 'now'],
+        'sleep': ['systemctl', 'suspend']
+    },
+    "Darwin": {  # macOS
+        'shutdown': ['shutdown', '-h', 'now'],
+        'restart': ['shutdown', '-r', 'now'],
+        'sleep': ['pmset', 'sleepnow']
+    },
+}
+
+
+def action_command(action, system=None):
+    """
+    Command line for a system action on this (or the given) operating system.
+
+    Raises:
+        OSError: if the operating system is not supported.
+    """
+    system = system or platform.system()
+    action_map = ACTION_COMMANDS.get(system)
+    if action_map is None:
+        raise OSError(f"Unsupported OS: {system}")
+    return list(action_map.get(action, action_map['shutdown']))
+
+
+def shutdown_system(action='shutdown'):
+    """
+    Perform system action based on user selection, cross-platform compatible.
+
+    Args:
+        action (str): Desired system action ('shutdown', 'restart', 'sleep').
+    """
+    try:
+        if action is None:
+            return
+        subprocess.run(action_command(action), check=True)
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+class ResolvedAction:
+    """A system action checked ahead of time: its command and anything that will stop it"""
+    def __init__(self, action, argv, problems):
+        self.action = action
+        self.argv = argv
+        self.problems = problems
+
+    @property
+    def ok(self):
+        return not self.problems
+
+
+def resolve_action(action, system=None, which=shutil.which):
+    """Resolve the command for action and check that it can run"""
+    if action is None:
+        return ResolvedAction(None, None, [])
+    system = system or platform.system()
+    try:
+        argv = action_command(action, system)
+    except OSError as e:
+        return ResolvedAction(action, None, [str(e)])
+
+    problems = []
+    binary = which(argv[0])
+    if binary is None:
+        problems.append(f"{argv[0]} not found on PATH")
+    else:
+        argv[0] = binary
+    is_root = getattr(os, "geteuid", lambda: 0)() == 0
+    if not is_root:
+        if system == "Darwin" and action != 'sleep':
+            problems.append(f"{action} needs root privileges on macOS")
+        elif system == "Linux" and which("systemctl") is None:
+            # Without systemd-logind only root may power the machine off
+            problems.append(f"{action} needs root privileges without systemd")
+    return ResolvedAction(action, argv, problems)
+
+
+class Hook:
+    """A command that has to finish before the system action, e.g. a backup script"""
+    TIMEOUT = 60
+
+    def __init__(self, name, argv, timeout=TIMEOUT):
+        self.name = name
+        self.argv = argv
+        self.timeout = timeout
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Build a hook from its config form, e.g. {"name": "sync", "command": "sync", "timeout": 30}.
+
+        The command is a list of arguments or a string split like a shell
+        would; it is not run through a shell.
+
+        Raises:
+            ValueError: if a field is missing or has the wrong type.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"hook must be an object: {data!r}")
+        command = data.get("command")
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if not command or not isinstance(command, list) or not all(isinstance(arg, str) for arg in command):
+            raise ValueError(f"hook command must be a string or a list of strings: {data!r}")
+        timeout = data.get("timeout", cls.TIMEOUT)
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+            raise ValueError(f"hook timeout must be a positive number of seconds: {data!r}")
+        return cls(str(data.get("name") or command[0]), command, timeout)
+
+    def to_json(self):
+        return {"name": self.name, "command": self.argv, "timeout": self.timeout}
+
+
+class HookResult:
+    def __init__(self, name):
+        self.name = name
+        self.returncode = None
+        self.output = ""
+        self.error = None
+        self.duration = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    def status(self):
+        if self.error is not None:
+            return self.error
+        return "ok" if self.returncode == 0 else f"exit status {self.returncode}"
+
+    def __repr__(self):
+        return f"HookResult({self.name!r}, {self.status()}, {self.duration:.3f}s)"
+
+
+def run_hooks(hooks, backend, deadline, workers, on_progress=None):
+    """
+    Run hooks concurrently, at most workers at a time, and wait for all of them.
+
+    Each hook gets its own timeout, shortened so that none runs past
+    deadline seconds from now; hooks still queued at the deadline are
+    skipped. on_progress(result, done, total) is called from the pool
+    threads as each hook ends.
+
+    Returns:
+        list: a HookResult per hook, in the order they finished.
+    """
+    start = time.monotonic()
+
+    def run(hook):
+        result = HookResult(hook.name)
+        left = deadline - (time.monotonic() - start)
+        if left <= 0:
+            result.error = "skipped, deadline passed"
+            return result
+        timeout = min(hook.timeout, left)
+        hook_start = time.perf_counter()
+        try:
+            result.returncode, result.output = backend.run(hook.argv, timeout)
+        except subprocess.TimeoutExpired:
+            result.error = f"timed out after {timeout:.1f}s"
+        except OSError as e:
+            result.error = str(e)
+        result.duration = time.perf_counter() - hook_start
+        return result
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="hook") as pool:
+        futures = [pool.submit(run, hook) for hook in hooks]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"Shutaap: hook {result.name}: {result.status()} in {result.duration:.3f}s")
+            if on_progress is not None:
+                on_progress(result, len(results), len(hooks))
+    return results
+
+
+class ActionResult:
+    def __init__(self, action, argv, returncode=None, output="", error=None, duration=0.0, dry_run=False):
+        self.action = action
+        self.argv = argv
+        self.returncode = returncode
+        self.output = output
+        self.error = error
+        self.duration = duration
+        self.dry_run = dry_run
+        self.hooks = []
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    def __repr__(self):
+        status = "ok" if self.ok else (self.error or f"exit status {self.returncode}")
+        return f"ActionResult({self.action!r}, {status}, {self.duration:.3f}s)"
+
+    def report(self):
+        """Print how the action went; nothing when there was no action"""
+        if self.action is None:
+            return
+        if self.ok:
+            print(f"Shutaap: {self.action} finished in {self.duration:.3f}s")
+        else:
+            print(f"Error: {self.action} failed: {self.error or self.output.strip() or self.returncode}")
+
+
+class SubprocessBackend:
+    """Run action commands for real"""
+    dry_run = False
+
+    def run(self, argv, timeout):
+        completed = subprocess.run(argv, timeout=timeout, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True)
+        return completed.returncode, completed.stdout
+
+
+class DryRunBackend:
+    """Record action commands instead of running them"""
+    dry_run = True
+
+    def __init__(self, echo=True):
+        self.echo = echo
+        self.invocations = []
+
+    def run(self, argv, timeout):
+        self.invocations.append((list(argv), timeout))
+        if self.echo:
+            print(f"Dry run: {' '.join(argv)}")
+        return 0, ""
+
+
+class ActionExecutor:
+    """
+    Run the configured system action without blocking the caller.
+
+    configure() resolves and validates the command up front, so problems
+    surface when the action is chosen rather than when the countdown hits
+    zero. execute() first runs the pre-action hooks (see run_hooks), then
+    the action, on a worker thread with a timeout, and hands an
+    ActionResult to the callback from that thread.
+    """
+    TIMEOUT = 30
+    HOOK_DEADLINE = 300
+    HOOK_WORKERS = 4
+
+    def __init__(self, backend=None, timeout=TIMEOUT):
+        self.backend = backend or SubprocessBackend()
+        self.timeout = timeout
+        self.resolved = ResolvedAction(None, None, [])
+        self.hooks = []
+        self.hook_deadline = self.HOOK_DEADLINE
+        self.hook_workers = self.HOOK_WORKERS
+
+    def configure(self, action, hooks=(), hook_deadline=HOOK_DEADLINE, hook_workers=HOOK_WORKERS):
+        self.resolved = resolve_action(action)
+        self.hooks = list(hooks)
+        self.hook_deadline = hook_deadline
+        self.hook_workers = hook_workers
+        return self.resolved
+
+    def execute(self, on_done=None, on_progress=None):
+        resolved = self.resolved
+        if resolved.action is None and not self.hooks:
+            return None
+        worker = threading.Thread(target=self._run, args=(resolved, list(self.hooks), on_done, on_progress),
+                                  name="system-action", daemon=True)
+        worker.start()
+        return worker
+
+    def _run(self, resolved, hooks, on_done, on_progress):
+        start = time.perf_counter()
+        result = ActionResult(resolved.action, resolved.argv, dry_run=self.backend.dry_run)
+        if hooks:
+            result.hooks = run_hooks(hooks, self.backend, self.hook_deadline, self.hook_workers, on_progress)
+        try:
+            if resolved.action is None:
+                result.returncode = 0
+            elif resolved.argv is None:
+                raise OSError("; ".join(resolved.problems))
+            else:
+                result.returncode, result.output = self.backend.run(resolved.argv, self.timeout)
+        except subprocess.TimeoutExpired:
+            result.error = f"timed out after {self.timeout}s"
+        except OSError as e:
+            result.error = str(e)
+        result.duration = time.perf_counter() - start
+        if on_done is not None:
+            on_done(result)
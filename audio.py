@@ -0,0 +1,480 @@
+import hashlib
+import importlib.util
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from tracer import NULL_TRACER
+
+# pygame is imported by the audio thread on first use; importing it and
+# opening the audio device are among the slowest parts of startup
+pygame = None
+
+
+def load_pygame():
+    """Import pygame on first use"""
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
+
+class SoundBank:
+    """
+    Decoded sound buffers, kept within a memory budget.
+
+    Short cues are decoded once and played from memory instead of
+    re-decoding the MP3. Assets whose file is at least STREAM_MIN_BYTES are
+    long loops; they are streamed from disk through pygame.mixer.music
+    rather than decoded. When the decoded buffers exceed budget_bytes the
+    least recently used idle ones are dropped; dropping a buffer that a
+    channel is still playing would free nothing.
+    """
+    EXTENSIONS = ('.mp3', '.ogg', '.wav')
+    BUDGET_BYTES = 16 * 1024 * 1024
+    STREAM_MIN_BYTES = 1024 * 1024
+
+    def __init__(self, sound_dir, budget_bytes=BUDGET_BYTES, stream_min_bytes=STREAM_MIN_BYTES):
+        self.sound_dir = sound_dir
+        self.budget_bytes = budget_bytes
+        self.stream_min_bytes = stream_min_bytes
+        # name -> (sound, decoded bytes), least recently used first
+        self.sounds = OrderedDict()
+        self.resident_bytes = 0
+        self.decode_times = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def names(self):
+        """Names of every decodable asset in the sound directory"""
+        try:
+            entries = os.listdir(self.sound_dir)
+        except OSError:
+            return []
+        return sorted(name for name in entries if name.lower().endswith(self.EXTENSIONS))
+
+    def path(self, name):
+        return os.path.join(self.sound_dir, name)
+
+    def streams(self, name):
+        """Whether name is long enough to be streamed instead of decoded"""
+        try:
+            return os.path.getsize(self.path(name)) >= self.stream_min_bytes
+        except OSError:
+            return False
+
+    def preload(self):
+        """Decode every short asset that is not cached yet"""
+        for name in self.names():
+            self.preload_one(name)
+
+    def preload_one(self, name):
+        """Decode name ahead of use, unless it streams or the budget is used up"""
+        if self.streams(name) or self.resident_bytes >= self.budget_bytes:
+            return
+        try:
+            self._load(name)
+        except pygame.error as e:
+            print(f"Error: could not decode {name}: {e}")
+
+    def get(self, name):
+        """Return the decoded sound for name, decoding it on a cache miss"""
+        with self._lock:
+            entry = self.sounds.get(name)
+            if entry is not None:
+                self.sounds.move_to_end(name)
+                self.hits += 1
+                if self.resident_bytes > self.budget_bytes:
+                    # Buffers that were playing at the last eviction may be idle now
+                    self._evict(keep=name)
+                return entry[0]
+            self.misses += 1
+        return self._load(name)
+
+    def _load(self, name):
+        with self._lock:
+            entry = self.sounds.get(name)
+            if entry is not None:
+                return entry[0]
+            start = time.perf_counter()
+            sound = pygame.mixer.Sound(self.path(name))
+            self.decode_times[name] = time.perf_counter() - start
+            size = self.sound_bytes(sound)
+            self.sounds[name] = (sound, size)
+            self.resident_bytes += size
+            self._evict(keep=name)
+            return sound
+
+    def _evict(self, keep):
+        for name, (sound, size) in list(self.sounds.items()):
+            if self.resident_bytes <= self.budget_bytes:
+                return
+            if name == keep or sound.get_num_channels():
+                continue
+            del self.sounds[name]
+            self.resident_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def sound_bytes(sound):
+        """Size of a decoded buffer, from its length and the mixer format"""
+        frequency, sample_format, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * frequency) * channels * (abs(sample_format) // 8)
+
+    def hit_rate(self):
+        """Fraction of lookups served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Decode time per asset (in milliseconds), cache hit rate and resident audio bytes"""
+        with self._lock:
+            return {
+                "decode_ms": {name: round(t * 1000, 2) for name, t in self.decode_times.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+                "resident_bytes": self.resident_bytes,
+                "budget_bytes": self.budget_bytes,
+                "resident": list(self.sounds),
+                "evictions": self.evictions,
+            }
+
+
+def premix_available():
+    """Whether NumPy is installed, checked without importing it"""
+    return importlib.util.find_spec("numpy") is not None
+
+
+class SequenceRenderer:
+    """
+    Mix a timeline of cues into a single PCM buffer with NumPy.
+
+    A sequence is a tuple of (offset seconds, sound name, loop) cues plus its
+    length in seconds. The mix is kept in memory and, when cache_dir is set,
+    saved as .npy keyed by the cues, the source files and the mixer format,
+    so each configuration is rendered once.
+    """
+    def __init__(self, sound_bank, cache_dir=None):
+        self.sound_bank = sound_bank
+        self.cache_dir = cache_dir
+        self.key = None
+        self.mix = None
+        self.render_time = None
+
+    def cache_key(self, cues, length):
+        sources = []
+        for name in sorted({name for _, name, _ in cues}):
+            stat = os.stat(self.sound_bank.path(name))
+            sources.append((name, stat.st_size, stat.st_mtime_ns))
+        text = repr((cues, length, pygame.mixer.get_init(), sources))
+        return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+    def get(self, cues, length):
+        """The mixed samples for a sequence, rendering them on first use"""
+        import numpy
+        import pygame.sndarray
+        key = self.cache_key(cues, length)
+        if key == self.key:
+            return self.mix
+        cached_file = os.path.join(self.cache_dir, f"sequence-{key}.npy") if self.cache_dir else None
+        mix = None
+        if cached_file and os.path.exists(cached_file):
+            try:
+                mix = numpy.load(cached_file)
+            except (OSError, ValueError) as e:
+                print(f"Error: could not read {cached_file}: {e}")
+        if mix is None:
+            start = time.perf_counter()
+            mix = self.render(cues, length)
+            self.render_time = time.perf_counter() - start
+            if cached_file:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    temp_path = cached_file + ".tmp.npy"
+                    numpy.save(temp_path, mix)
+                    os.replace(temp_path, cached_file)
+                except OSError as e:
+                    print(f"Error: could not cache {cached_file}: {e}")
+        self.key, self.mix = key, mix
+        return mix
+
+    def render(self, cues, length):
+        import numpy
+        frequency = pygame.mixer.get_init()[0]
+        frames = int(length * frequency)
+        mix = None
+        for offset, name, loop in cues:
+            samples = pygame.sndarray.array(self.sound_bank.get(name))
+            if mix is None:
+                dtype = samples.dtype
+                mix = numpy.zeros((frames,) + samples.shape[1:], numpy.float32)
+            start = int(offset * frequency)
+            if start >= frames:
+                continue
+            span = frames - start
+            if loop and len(samples) < span:
+                samples = numpy.tile(samples, (-(-span // len(samples)),) + (1,) * (samples.ndim - 1))
+            samples = samples[:span]
+            mix[start:start + len(samples)] += samples
+        if mix is None:
+            return numpy.zeros((0, pygame.mixer.get_init()[2]), numpy.int16)
+        if numpy.issubdtype(dtype, numpy.integer):
+            limits = numpy.iinfo(dtype)
+            numpy.clip(mix, limits.min, limits.max, out=mix)
+        else:
+            numpy.clip(mix, -1.0, 1.0, out=mix)
+        return mix.astype(dtype)
+
+    def resident_bytes(self):
+        return self.mix.nbytes if self.mix is not None else 0
+
+
+class AudioCommand:
+    __slots__ = ('kind', 'name', 'loop', 'start_time', 'fade_ms', 'sequence', 'tag', 'enqueued_at')
+
+    def __init__(self, kind, name=None, loop=False, start_time=0, fade_ms=0, sequence=None, tag=None):
+        self.kind = kind
+        self.name = name
+        self.tag = tag
+        self.loop = loop
+        self.start_time = start_time
+        self.fade_ms = fade_ms
+        self.sequence = sequence
+        self.enqueued_at = time.perf_counter()
+
+
+class AudioThread(threading.Thread):
+    """
+    The only thread that touches the pygame mixer.
+
+    Callers enqueue play/stop/fade commands and return immediately; the
+    thread executes them strictly in order. Every known cue owns a reserved
+    channel so that starting one sound never steals the channel of another;
+    any other sound plays on one of FREE_CHANNELS unreserved channels, and
+    the thread remembers which so it can be stopped by name.
+
+    Several owners can play the same sound by tagging it: a tagged sound
+    always gets an unreserved channel of its own, and stopping with a tag
+    only reaches the channels started under it.
+    While the queue is idle the thread decodes the sound bank one asset at a
+    time.
+
+    A premixed sequence (see SequenceRenderer) plays on a channel of its own
+    and can start part way through.
+
+    pygame.mixer.music is the only stream slot. A long loop streams through
+    it when it is free; if another stream already holds it, the loop is
+    decoded into the sound bank instead.
+    """
+    CHANNELS = {
+        'ticking-clock-sound.mp3': 0,
+        'countdown.mp3': 1,
+        'alarm.mp3': 2,
+        'bomb-beeps.mp3': 3,
+        'explode.mp3': 4,
+        'final sequence': 5,
+    }
+    SEQUENCE = 'final sequence'
+    FREE_CHANNELS = 8
+    LATENCY_HISTORY = 256
+
+    def __init__(self, sound_bank, on_ready=None, tracer=NULL_TRACER, cache_dir=None):
+        super().__init__(name="audio", daemon=True)
+        self.sound_bank = sound_bank
+        self.sequence_renderer = SequenceRenderer(sound_bank, cache_dir)
+        self.on_ready = on_ready
+        self.tracer = tracer
+        self.timings = {}
+        self.available = False
+        self.latencies = deque(maxlen=self.LATENCY_HISTORY)
+        self._commands = queue.SimpleQueue()
+        # Sound currently playing through pygame.mixer.music
+        self.stream_name = None
+        # (tag, name) -> [(channel, sound)] for sounds without a reserved channel
+        self.voices = {}
+
+    # Producer side, safe to call from any thread
+
+    def play(self, name, loop=False, start_time=0, tag=None):
+        self._put(AudioCommand('play', name, loop=loop, start_time=start_time, tag=tag))
+
+    def stop(self, name=None, tag=None):
+        """Stop one sound, or every sound when name is None, of tag if given"""
+        self._put(AudioCommand('stop', name, tag=tag))
+
+    def fade(self, fade_ms, name=None, tag=None):
+        """Fade out one sound, or every sound when name is None, of tag if given"""
+        self._put(AudioCommand('fade', name, fade_ms=fade_ms, tag=tag))
+
+    def prepare_sequence(self, cues, length):
+        """Render a sequence ahead of time so that playing it later is instant"""
+        self._put(AudioCommand('render', self.SEQUENCE, sequence=(tuple(cues), length)))
+
+    def play_sequence(self, cues, length, offset=0):
+        """Play a premixed sequence, starting offset seconds into it"""
+        self._put(AudioCommand('play', self.SEQUENCE, start_time=offset, sequence=(tuple(cues), length)))
+
+    def _put(self, command):
+        if self.tracer.enabled:
+            self.tracer.instant("audio enqueue", "audio", kind=command.kind, sound=command.name)
+        self._commands.put(command)
+
+    def shutdown(self):
+        self._commands.put(None)
+
+    def resident_bytes(self):
+        """Bytes of decoded and premixed audio held in memory"""
+        return self.sound_bank.resident_bytes + self.sequence_renderer.resident_bytes()
+
+    def latency_stats(self):
+        """Enqueue-to-audible latency of recent commands, in milliseconds"""
+        samples = list(self.latencies)
+        if not samples:
+            return {"count": 0}
+        values = sorted(ms for _, _, ms in samples)
+        kind, name, last_ms = samples[-1]
+        return {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "max_ms": round(values[-1], 3),
+            "last": {"kind": kind, "sound": name, "ms": round(last_ms, 3)},
+        }
+
+    # Consumer side, runs on the audio thread
+
+    def run(self):
+        start = time.perf_counter()
+        load_pygame()
+        self.timings["pygame import"] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            pygame.mixer.init()
+            pygame.mixer.set_num_channels(len(self.CHANNELS) + self.FREE_CHANNELS)
+            pygame.mixer.set_reserved(len(self.CHANNELS))
+            self.available = True
+        except pygame.error as e:
+            print(f"Error: audio unavailable: {e}")
+        self.timings["mixer init"] = time.perf_counter() - start
+        if self.on_ready is not None:
+            self.on_ready()
+
+        pending = deque(self.sound_bank.names() if self.available else [])
+        while True:
+            try:
+                command = self._commands.get(block=not pending)
+            except queue.Empty:
+                self.sound_bank.preload_one(pending.popleft())
+                continue
+            if command is None:
+                break
+            if self.available:
+                start = self.tracer.now()
+                try:
+                    self._execute(command)
+                except (pygame.error, OSError, ImportError, ValueError) as e:
+                    print(f"Error: {command.kind} {command.name}: {e}")
+                if self.tracer.enabled:
+                    self.tracer.complete(f"audio {command.kind}", "audio", start, sound=command.name,
+                                         queued_ms=round((start - command.enqueued_at) * 1000, 3))
+
+        if self.available:
+            pygame.mixer.quit()
+
+    def _channel(self, name):
+        return pygame.mixer.Channel(self.CHANNELS[name])
+
+    def _forget_finished(self):
+        for key, voices in list(self.voices.items()):
+            voices = [(channel, sound) for channel, sound in voices if channel.get_sound() is sound]
+            if voices:
+                self.voices[key] = voices
+            else:
+                del self.voices[key]
+
+    def _take_voices(self, name, tag):
+        """Forget the free channels name (or anything, if None) was started on under tag and return those still playing"""
+        keys = [key for key in self.voices if key[0] == tag and name in (None, key[1])]
+        voices = [voice for key in keys for voice in self.voices.pop(key)]
+        # A channel that finished may since have been given to another sound
+        return [channel for channel, sound in voices if channel.get_sound() is sound]
+
+    def _stream_free(self, name):
+        return self.stream_name in (None, name) or not pygame.mixer.music.get_busy()
+
+    def _execute(self, command):
+        if command.kind == 'render':
+            self.sequence_renderer.get(*command.sequence)
+        elif command.kind == 'play':
+            if command.sequence is not None:
+                mix = self.sequence_renderer.get(*command.sequence)
+                start = int(command.start_time * pygame.mixer.get_init()[0])
+                channel = self._channel(command.name)
+                if start < len(mix):
+                    channel.play(pygame.sndarray.make_sound(mix[start:]))
+                busy = channel.get_busy()
+            # Cached buffers cannot seek, so offset cues always stream
+            elif command.tag is None and (command.start_time or (self.sound_bank.streams(command.name)
+                                                                 and self._stream_free(command.name))):
+                pygame.mixer.music.load(self.sound_bank.path(command.name))
+                pygame.mixer.music.play(loops=-1 if command.loop else 0, start=command.start_time)
+                self.stream_name = command.name
+                busy = pygame.mixer.music.get_busy()
+            else:
+                sound = self.sound_bank.get(command.name)
+                loops = -1 if command.loop else 0
+                if command.tag is None and command.name in self.CHANNELS:
+                    channel = self._channel(command.name)
+                    channel.play(sound, loops=loops)
+                else:
+                    # Sound.play only picks from the unreserved channels
+                    channel = sound.play(loops=loops)
+                    if channel is None:
+                        raise pygame.error("no free channel")
+                    self._forget_finished()
+                    self.voices.setdefault((command.tag, command.name), []).append((channel, sound))
+                busy = channel.get_busy()
+            if busy and self.tracer.enabled:
+                # The mixer is playing the sound from here on
+                self.tracer.instant("audio audible", "audio", sound=command.name)
+        elif command.kind == 'stop':
+            if command.tag is not None:
+                for channel in self._take_voices(command.name, command.tag):
+                    channel.stop()
+            elif command.name is None:
+                pygame.mixer.music.stop()
+                self.stream_name = None
+                pygame.mixer.stop()
+                self.voices.clear()
+            else:
+                if command.name == self.stream_name:
+                    pygame.mixer.music.stop()
+                    self.stream_name = None
+                if command.name in self.CHANNELS:
+                    self._channel(command.name).stop()
+                for channel in self._take_voices(command.name, None):
+                    channel.stop()
+        elif command.kind == 'fade':
+            if command.tag is not None:
+                for channel in self._take_voices(command.name, command.tag):
+                    channel.fadeout(command.fade_ms)
+            elif command.name is None:
+                pygame.mixer.music.fadeout(command.fade_ms)
+                self.stream_name = None
+                pygame.mixer.fadeout(command.fade_ms)
+                self.voices.clear()
+            else:
+                if command.name == self.stream_name:
+                    pygame.mixer.music.fadeout(command.fade_ms)
+                    self.stream_name = None
+                if command.name in self.CHANNELS:
+                    self._channel(command.name).fadeout(command.fade_ms)
+                for channel in self._take_voices(command.name, None):
+                    channel.fadeout(command.fade_ms)
+        latency = (time.perf_counter() - command.enqueued_at) * 1000
+        self.latencies.append((command.kind, command.name, latency))
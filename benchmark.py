@@ -0,0 +1,211 @@
+"""
+Benchmarks for the Shutaap hot paths.
+
+Runs on the offscreen Qt platform with the dummy SDL audio driver, so it
+needs no display or sound card:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 10
+
+With --baseline the median of every benchmark is compared against the
+saved results, and the exit status is 1 if any got slower by more than
+--threshold percent.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from PyQt5.QtWidgets import QApplication
+
+import shutaap
+from actions import DryRunBackend
+from config import ConfigStore
+
+
+def measure(function, repeat):
+    """Call function repeat times and return the duration of each call in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    values = [s * 1000 for s in samples]
+    return {
+        "runs": len(values),
+        "min_ms": round(min(values), 4),
+        "median_ms": round(statistics.median(values), 4),
+        "mean_ms": round(statistics.fmean(values), 4),
+        "max_ms": round(max(values), 4),
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_window(directory):
+    """A window with the default config and its own cache under directory, so user files never affect a run"""
+    window = shutaap.ShutdownTimerApp(scale_factor=0.15, action_backend=DryRunBackend(echo=False),
+                                      config_store=ConfigStore(os.path.join(directory, "config.json")),
+                                      cache_dir=os.path.join(directory, "cache"))
+    window.countdown.clock = FakeClock()
+    return window
+
+
+def bench_init(app, directory, repeat):
+    """Warm starts: the caches in directory were filled by an earlier window"""
+    windows = []
+
+    def create():
+        windows.append(make_window(directory))
+
+    samples = measure(create, repeat)
+    for window in windows:
+        window.close()
+        window.deleteLater()
+    app.processEvents()
+    return samples
+
+
+def bench_paint(app, window, repeat):
+    """A full synchronous repaint mid-countdown: static layer, hands and red region"""
+    window.show()
+    app.processEvents()
+    window.check_visibility()
+    window.countdown.clock.now = 0.0
+    window.start_countdown(120)
+    window.countdown.clock.now = 60.0
+    window.update_clock()
+    window.timer.stop()
+    return measure(window.repaint, repeat)
+
+
+def bench_update_clock(window, repeat):
+    """One countdown from 30 seconds, crossing every sound and vibration threshold"""
+    clock = window.countdown.clock
+    samples = []
+    for _ in range(repeat):
+        window.stop_vibration()
+        clock.now = 0.0
+        window.start_countdown(30)
+        for second in range(1, 31):
+            clock.now = float(second)
+            start = time.perf_counter()
+            window.update_clock()
+            samples.append(time.perf_counter() - start)
+    window.timer.stop()
+    window.stop_vibration()
+    return samples
+
+
+def bench_sound_dispatch(window, repeat):
+    """Queueing a cue on the audio thread, as the GUI thread sees it"""
+    samples = measure(lambda: window.start_background_sound('bomb-beeps.mp3'), repeat)
+    window.stop_background_sound()
+    return samples
+
+
+def bench_window_shape(window, repeat):
+    """The window shape computed from the static layer and read back from the cache"""
+    computed = shutaap.WindowShapeCache.compute(window.static_layer)
+    cached = window.shape_cache.load(window.static_layer, *window.window_shape_key)
+    compute_samples = measure(lambda: shutaap.WindowShapeCache.compute(window.static_layer), repeat)
+    cached_samples = measure(lambda: window.shape_cache.load(window.static_layer, *window.window_shape_key), repeat)
+    return compute_samples, cached_samples, computed == cached
+
+
+def run(repeat):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    with tempfile.TemporaryDirectory(prefix="shutaap-bench-") as directory:
+        window = make_window(directory)
+        results, shape_matches = run_window(app, window, directory, repeat)
+        window.close()
+        window.config_store.flush()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "window_shape_matches": shape_matches,
+        "benchmarks": results,
+    }
+
+
+def run_window(app, window, directory, repeat):
+    """
+    Returns:
+        tuple: (results by benchmark name, whether the cached window shape matches the computed one)
+    """
+    results = {"__init__": summarize(bench_init(app, directory, max(1, repeat // 10)))}
+    compute_samples, cached_samples, shape_matches = bench_window_shape(window, repeat)
+    results["window shape (computed)"] = summarize(compute_samples)
+    results["window shape (cached)"] = summarize(cached_samples)
+    results["paintEvent"] = summarize(bench_paint(app, window, repeat))
+    results["update_clock"] = summarize(bench_update_clock(window, max(1, repeat // 10)))
+    results["start_background_sound"] = summarize(bench_sound_dispatch(window, repeat * 10))
+    return results, shape_matches
+
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks whose median grew more than threshold percent"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or not previous["median_ms"]:
+            continue
+        change = (current["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+        current["change_percent"] = round(change, 1)
+        if change > threshold:
+            regressions.append((name, previous["median_ms"], current["median_ms"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Shutaap render, audio and startup paths")
+    parser.add_argument("--repeat", type=int, default=100,
+                        help="calls per benchmark (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="allowed slowdown of a median, in percent (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    # Assets are resolved relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = run(args.repeat)
+    regressions = []
+    if args.baseline:
+        with open(os.path.join(cwd, args.baseline)) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(os.path.join(cwd, args.output), "w") as file:
+            file.write(text + "\n")
+    print(text)
+
+    for name, before, after, change in regressions:
+        print(f"Regression: {name} median {before:.4f} ms -> {after:.4f} ms (+{change:.1f}%)")
+    if not results["window_shape_matches"]:
+        print("Mismatch: the cached window shape differs from the computed one")
+    return 1 if regressions or not results["window_shape_matches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+import threading
+
+from actions import Hook
+from countdown import Cue, parse_cues
+from scheduler import ScheduledJob
+
+CONFIG_PATH = os.path.join(os.path.expanduser("~"), "shutdown_timer_config.json")
+SCHEMA_VERSION = 1
+
+# The built-in end sequence: vibration, the spoken countdown and the alarm
+# loop at 23 seconds, then the bomb and explosion at 3
+DEFAULT_CUES = [
+    {"offset": 23, "sound": "countdown.mp3", "vibrate": True},
+    {"offset": 23, "sound": "alarm.mp3", "loop": True},
+    {"offset": 3, "sound": "bomb-beeps.mp3"},
+    {"offset": 3, "sound": "explode.mp3"},
+]
+
+
+def _migrate_unversioned(data):
+    """Files written before the schema was versioned already use the v1 keys"""
+    return data
+
+# Each migration upgrades a file from the version it is keyed by to the next
+MIGRATIONS = {
+    0: _migrate_unversioned,
+}
+
+
+class Config:
+    """Typed view of the configuration file"""
+    def __init__(self, timer_increase=10, system_action="shutdown", audio_budget_mb=16, cues=None,
+                 hooks=None, hook_deadline=300, hook_workers=4, scheduled=None, extra=None):
+        self.timer_increase = timer_increase
+        self.system_action = system_action
+        # Memory allowed for decoded sound buffers
+        self.audio_budget_mb = audio_budget_mb
+        # Sounds and vibration of the end sequence, as Cue objects
+        self.cues = cues if cues is not None else [Cue.from_json(cue) for cue in DEFAULT_CUES]
+        # Commands run before the system action, as Hook objects, and the
+        # limits on how long and how many at a time
+        self.hooks = hooks if hooks is not None else []
+        self.hook_deadline = hook_deadline
+        self.hook_workers = hook_workers
+        # Action handed to the system scheduler, as a ScheduledJob
+        self.scheduled = scheduled
+        # Keys this version does not know about, written back untouched
+        self.extra = dict(extra or {})
+
+    @classmethod
+    def from_json(cls, data):
+        version = data.get("schema version", 0)
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"config schema version {version} is newer than {SCHEMA_VERSION}")
+        while version < SCHEMA_VERSION:
+            data = MIGRATIONS[version](data)
+            version += 1
+        extra = {key: value for key, value in data.items()
+                 if key not in ("schema version", "total increase in timer", "system action",
+                                "audio memory budget (MB)", "cues", "pre-action hooks",
+                                "hook deadline (seconds)", "hook workers", "scheduled action")}
+        timer_increase = data.get("total increase in timer", 10)
+        system_action = data.get("system action", "shutdown")
+        audio_budget_mb = data.get("audio memory budget (MB)", 16)
+        cues = parse_cues(data.get("cues", DEFAULT_CUES))
+        hooks = data.get("pre-action hooks", [])
+        hook_deadline = data.get("hook deadline (seconds)", 300)
+        hook_workers = data.get("hook workers", 4)
+        if not isinstance(hooks, list):
+            raise ValueError(f"pre-action hooks must be a list: {hooks!r}")
+        hooks = [Hook.from_json(hook) for hook in hooks]
+        scheduled = data.get("scheduled action")
+        if scheduled is not None:
+            scheduled = ScheduledJob.from_json(scheduled)
+        if not isinstance(timer_increase, int) or timer_increase < 0:
+            raise ValueError(f"invalid timer increase: {timer_increase!r}")
+        if system_action not in ("shutdown", "restart", "sleep", None):
+            raise ValueError(f"invalid system action: {system_action!r}")
+        if not isinstance(audio_budget_mb, (int, float)) or audio_budget_mb < 0:
+            raise ValueError(f"invalid audio memory budget: {audio_budget_mb!r}")
+        if not isinstance(hook_deadline, (int, float)) or hook_deadline <= 0:
+            raise ValueError(f"invalid hook deadline: {hook_deadline!r}")
+        if not isinstance(hook_workers, int) or hook_workers < 1:
+            raise ValueError(f"invalid hook workers: {hook_workers!r}")
+        return cls(timer_increase, system_action, audio_budget_mb, cues, hooks, hook_deadline, hook_workers,
+                   scheduled, extra)
+
+    def to_json(self):
+        data = dict(self.extra)
+        data.update({
+            "schema version": SCHEMA_VERSION,
+            "total increase in timer": self.timer_increase,
+            "system action": self.system_action,
+            "audio memory budget (MB)": self.audio_budget_mb,
+            "cues": [cue.to_json() for cue in self.cues],
+            "pre-action hooks": [hook.to_json() for hook in self.hooks],
+            "hook deadline (seconds)": self.hook_deadline,
+            "hook workers": self.hook_workers,
+            "scheduled action": self.scheduled.to_json() if self.scheduled is not None else None,
+        })
+        return data
+
+
+class ConfigStore:
+    """
+    Configuration loaded once into a Config and saved in the background.
+
+    Updates apply to the in-memory Config immediately. Writes are debounced,
+    so a burst of updates is written once, and happen on a timer thread as a
+    temp file followed by os.replace, so a crash never leaves a half-written
+    file. reload_if_changed() picks up edits made by other programs; the GUI
+    calls it from a file watcher. Updates not written yet are applied again
+    on top of a reloaded file, so neither side's changes are lost.
+    """
+    DEBOUNCE = 0.5
+
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self.config = Config()
+        self.load_error = None
+        self._lock = threading.Lock()
+        self._pending = None
+        # Updates since the last write, by key
+        self._changes = {}
+        self._known_stat = None
+
+    def _read(self):
+        stat = self._stat()
+        with open(self.path) as file:
+            return Config.from_json(json.load(file)), stat
+
+    def _apply(self, config, stat):
+        with self._lock:
+            for key, value in self._changes.items():
+                setattr(config, key, value)
+            self.config = config
+            self._known_stat = stat
+            self.load_error = None
+
+    def load(self):
+        """Read the file, keeping defaults if it is missing or unusable"""
+        try:
+            config, stat = self._read()
+        except FileNotFoundError:
+            return self.config
+        except OSError as e:
+            self.load_error = e
+            print(f"Error: could not read {self.path}, using defaults: {e}")
+            return self.config
+        except ValueError as e:
+            # Keep the broken file for inspection instead of overwriting it later
+            self.load_error = e
+            print(f"Error: {self.path} is corrupted, using defaults: {e}")
+            try:
+                os.replace(self.path, self.path + ".corrupt")
+            except OSError:
+                pass
+            return self.config
+        self._apply(config, stat)
+        return self.config
+
+    def update(self, **changes):
+        """Apply changes to the in-memory config and schedule a write"""
+        with self._lock:
+            for key, value in changes.items():
+                if not hasattr(self.config, key):
+                    raise AttributeError(f"unknown config key {key!r}")
+                setattr(self.config, key, value)
+                self._changes[key] = value
+            if self._pending is None:
+                self._pending = threading.Timer(self.DEBOUNCE, self.flush)
+                self._pending.daemon = True
+                self._pending.start()
+
+    def flush(self):
+        """Write the current config now if a write is pending"""
+        with self._lock:
+            if self._pending is None:
+                return
+            self._pending.cancel()
+            self._pending = None
+            self._changes = {}
+            data = self.config.to_json()
+            directory = os.path.dirname(self.path) or "."
+            try:
+                fd, temp_path = tempfile.mkstemp(prefix=".shutaap-", suffix=".json", dir=directory)
+                with os.fdopen(fd, "w") as file:
+                    json.dump(data, file, indent=4)
+                os.replace(temp_path, self.path)
+                self._known_stat = self._stat()
+            except OSError as e:
+                print(f"Error: could not save {self.path}: {e}")
+
+    def reload_if_changed(self):
+        """
+        Reload if another program changed the file; returns True if it did.
+
+        A file that does not parse, such as one an editor has truncated
+        before writing it again, is not quarantined: the current config is
+        kept until the next change.
+        """
+        try:
+            stat = self._stat()
+        except OSError:
+            return False
+        if stat == self._known_stat:
+            return False
+        try:
+            config, stat = self._read()
+        except (OSError, ValueError) as e:
+            print(f"Error: could not reload {self.path}, keeping the current settings: {e}")
+            return False
+        self._apply(config, stat)
+        return True
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
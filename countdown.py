@@ -0,0 +1,475 @@
+import bisect
+import math
+import sys
+import time
+
+
+if hasattr(time, 'CLOCK_BOOTTIME'):
+    def monotonic_clock():
+        """
+        Seconds from a clock that never jumps backwards.
+
+        CLOCK_BOOTTIME keeps counting while the machine is suspended, so time
+        spent asleep still counts towards the deadline.
+        """
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+else:
+    monotonic_clock = time.monotonic
+
+
+def split_hms(seconds):
+    """Split whole seconds into (hours, minutes, seconds)"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, seconds
+
+
+def format_hms(seconds):
+    return "%02d:%02d:%02d" % split_hms(seconds)
+
+
+class CountdownEngine:
+    """
+    Countdown keyed to a monotonic deadline.
+
+    The remaining time is always recomputed from the clock, so late or
+    missed ticks never accumulate drift: the next tick simply reports every
+    second that elapsed since the previous one. Timers may be any length.
+    """
+    def __init__(self, clock=monotonic_clock):
+        self.clock = clock
+        self.deadline = None
+        self.total_seconds = 0
+        self._last_seconds = 0
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    def start(self, seconds):
+        """(Re)start the countdown so that it ends seconds from now"""
+        self.deadline = self.clock() + seconds
+        self.total_seconds = seconds
+        self._last_seconds = int(seconds)
+
+    def stop(self):
+        self.deadline = None
+        self._last_seconds = 0
+
+    def remaining(self):
+        """Exact remaining time in seconds"""
+        if self.deadline is None:
+            return 0.0
+        return max(0.0, self.deadline - self.clock())
+
+    def remaining_seconds(self):
+        """Remaining time rounded up to whole seconds, as a clock shows it"""
+        return math.ceil(self.remaining())
+
+    def tick(self):
+        """
+        Advance to the current time.
+
+        Returns:
+            tuple: (previous, current) whole remaining seconds. Any seconds
+            missed since the last tick are covered in this single step.
+        """
+        previous = self._last_seconds
+        self._last_seconds = self.remaining_seconds()
+        return previous, self._last_seconds
+
+    def seconds_until_next_tick(self):
+        """Time until the whole remaining second next changes"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            return 0.0
+        return remaining - math.ceil(remaining) + 1
+
+
+class Cue:
+    """
+    Something that happens when offset seconds remain.
+
+    sound is played (looping if loop is set); vibrate switches the vibration
+    on or off, or leaves it alone when None.
+    """
+    __slots__ = ('offset', 'sound', 'loop', 'vibrate')
+
+    def __init__(self, offset, sound=None, loop=False, vibrate=None):
+        self.offset = offset
+        self.sound = sound
+        self.loop = loop
+        self.vibrate = vibrate
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Build a cue from its config form, e.g. {"offset": 23, "sound": "alarm.mp3", "loop": true}.
+
+        Raises:
+            ValueError: if a field is missing or has the wrong type.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"cue must be an object: {data!r}")
+        offset = data.get("offset")
+        sound = data.get("sound")
+        loop = data.get("loop", False)
+        vibrate = data.get("vibrate")
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            raise ValueError(f"cue offset must be whole seconds: {data!r}")
+        if sound is not None and not isinstance(sound, str):
+            raise ValueError(f"cue sound must be a file name: {data!r}")
+        if not isinstance(loop, bool) or vibrate not in (True, False, None):
+            raise ValueError(f"cue loop and vibrate must be true or false: {data!r}")
+        return cls(offset, sound, loop, vibrate)
+
+    def to_json(self):
+        data = {"offset": self.offset}
+        if self.sound is not None:
+            data["sound"] = self.sound
+        if self.loop:
+            data["loop"] = True
+        if self.vibrate is not None:
+            data["vibrate"] = self.vibrate
+        return data
+
+    def __repr__(self):
+        return f"Cue({self.offset}, {self.sound!r}, loop={self.loop}, vibrate={self.vibrate})"
+
+
+class CueTimeline:
+    """
+    Cues compiled into an array sorted by when they fire.
+
+    A cursor marks the first cue that has not fired yet. Each tick advances
+    it over every cue whose offset the remaining time has reached, so a late
+    tick fires everything it skipped and a tick between cues costs one
+    comparison however long the list is. Adding time moves the cursor back
+    with a binary search.
+    """
+    def __init__(self, cues):
+        # Largest offset first, which is the order they fire in
+        self.cues = sorted(cues, key=lambda cue: -cue.offset)
+        self._keys = [-cue.offset for cue in self.cues]
+        self.cursor = 0
+
+    def _due(self, remaining):
+        """Number of cues whose offset remaining has reached"""
+        return bisect.bisect_right(self._keys, -remaining)
+
+    def advance(self, remaining):
+        """The cues remaining has reached since the last tick, in firing order"""
+        if self.cursor == len(self.cues) or self.cues[self.cursor].offset < remaining:
+            return []
+        end = self._due(remaining)
+        fired = self.cues[self.cursor:end]
+        self.cursor = end
+        return fired
+
+    def rewind(self, remaining):
+        """
+        Move the cursor to remaining seconds, e.g. after time was added.
+
+        Returns:
+            list: cues remaining is already past, in firing order. Their
+            one-off sounds belong to a moment that is gone, but their loops
+            and vibration describe the state the countdown should be in.
+        """
+        self.cursor = self._due(remaining)
+        return self.cues[:self.cursor]
+
+    def next_offset(self):
+        """Offset of the next cue to fire, or None when every cue has fired"""
+        if self.cursor == len(self.cues):
+            return None
+        return self.cues[self.cursor].offset
+
+
+def parse_cues(entries):
+    """
+    Cues from their config form.
+
+    Raises:
+        ValueError: if entries is not a list of valid cues.
+    """
+    if not isinstance(entries, list):
+        raise ValueError(f"cues must be a list: {entries!r}")
+    return [Cue.from_json(entry) for entry in entries]
+
+
+def parse_hms(text):
+    """
+    Parse 'HH:MM:SS', 'MM:SS' or 'SS' into whole seconds.
+
+    Raises:
+        ValueError: if text is not in one of those formats.
+    """
+    parts = [int(part) for part in text.split(':')]
+    if not 1 <= len(parts) <= 3 or any(part < 0 for part in parts):
+        raise ValueError(f"invalid duration: {text!r}")
+    if any(part > 59 for part in parts[1:]):
+        raise ValueError(f"minutes and seconds must be below 60: {text!r}")
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+
+class HeadlessCountdown:
+    """
+    Countdown without a display.
+
+    Instead of ticking every second it sleeps until the deadline. Sleeps are
+    capped at MAX_SLEEP so a suspend, which pauses the sleep but not the
+    boot-time clock, is noticed promptly after resume. At zero the action
+    goes through executor, an ActionExecutor that may carry pre-action
+    hooks; by default one with the action alone.
+    """
+    MAX_SLEEP = 60.0
+
+    def __init__(self, seconds, action, clock=monotonic_clock, sleep=time.sleep, executor=None):
+        self.engine = CountdownEngine(clock)
+        self.seconds = seconds
+        self.action = action
+        self.sleep = sleep
+        if executor is None:
+            from actions import ActionExecutor
+            executor = ActionExecutor()
+            executor.configure(action)
+        self.executor = executor
+        self.wakeups = 0
+        self.started_at = None
+
+    def run(self):
+        """
+        Wait for the deadline, then run the hooks and the action.
+
+        Returns:
+            ActionResult: how they went, or None when there was nothing to run.
+        """
+        self.engine.start(self.seconds)
+        self.started_at = self.engine.clock()
+        while True:
+            remaining = self.engine.remaining()
+            if remaining <= 0:
+                break
+            self.sleep(min(remaining, self.MAX_SLEEP))
+            self.wakeups += 1
+        self.engine.stop()
+        results = []
+        worker = self.executor.execute(results.append)
+        if worker is not None:
+            worker.join()
+        return results[0] if results else None
+
+    def stats(self):
+        """Wakeups per minute and peak resident memory of this process"""
+        elapsed = self.engine.clock() - self.started_at if self.started_at is not None else 0.0
+        stats = {
+            "wakeups": self.wakeups,
+            "wakeups_per_minute": round(self.wakeups * 60 / elapsed, 3) if elapsed else 0.0,
+        }
+        try:
+            import resource
+        except ImportError:
+            return stats
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        stats["max_rss_kb"] = max_rss // 1024 if sys.platform == "darwin" else max_rss
+        return stats
+
+
+class Countdown:
+    """
+    A countdown for asyncio programs, on the same CountdownEngine as the window.
+
+        async with Countdown(90, action="sleep") as countdown:
+            async for remaining in countdown:
+                print(format_hms(remaining))
+            result = await countdown.finished
+
+    finished resolves when the system action has run, to its ActionResult
+    (None when action is None), and is cancelled by cancel(). To run
+    pre-action hooks too, pass executor, an ActionExecutor configured with
+    them, in place of action and backend; countdowns can share one. Iterating
+    yields the whole remaining seconds each time they change, ending at 0
+    or on cancel. Leaving the async with block cancels a countdown that
+    has not finished.
+
+    Each countdown holds one loop.call_at handle for its deadline, plus one
+    for the next whole second only while something iterates over it, so
+    thousands can share an event loop. Must be created inside a running
+    loop.
+    """
+    __slots__ = ('seconds', 'engine', 'loop', 'finished', 'executor', '_deadline_handle',
+                 '_tick_handle', '_waiters')
+    # Resolving looks the command up on PATH, so it is done once per action
+    _resolved = {}
+
+    def __init__(self, seconds, action=None, backend=None, executor=None):
+        # Imported here so that parse_hms stays cheap for the launch handoff
+        import asyncio
+
+        self.seconds = seconds
+        self.loop = asyncio.get_running_loop()
+        # The engine reads the loop's clock so call_at deadlines line up with it
+        self.engine = CountdownEngine(self.loop.time)
+        self.finished = self.loop.create_future()
+        self.executor = executor
+        if executor is None and action is not None:
+            from actions import ActionExecutor, resolve_action
+            resolved = Countdown._resolved.get(action)
+            if resolved is None:
+                resolved = Countdown._resolved[action] = resolve_action(action)
+            self.executor = ActionExecutor(backend)
+            self.executor.resolved = resolved
+        self._deadline_handle = None
+        self._tick_handle = None
+        self._waiters = []
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.cancel()
+
+    def __aiter__(self):
+        return self.updates()
+
+    @property
+    def running(self):
+        return self.engine.running
+
+    @property
+    def problems(self):
+        """Anything that will stop the action from running, e.g. a command missing from PATH"""
+        return self.executor.resolved.problems if self.executor is not None else []
+
+    def remaining(self):
+        """Exact remaining time in seconds"""
+        return self.engine.remaining()
+
+    def start(self):
+        if self.finished.done() or self.engine.running:
+            raise RuntimeError("countdown already started")
+        self.engine.start(self.seconds)
+        self._arm()
+
+    def add_time(self, seconds):
+        """Move the deadline seconds later (earlier when negative)"""
+        if not self.engine.running:
+            raise RuntimeError("countdown is not running")
+        self.engine.start(self.engine.remaining() + seconds)
+        self._arm()
+        self._wake()
+
+    def cancel(self):
+        """
+        Stop the countdown without running the action.
+
+        Returns:
+            bool: False if the countdown had already reached zero.
+        """
+        if not self.engine.running:
+            return False
+        self._deadline_handle.cancel()
+        self._deadline_handle = None
+        self.engine.stop()
+        self.finished.cancel()
+        self._wake()
+        return True
+
+    async def updates(self):
+        """Whole remaining seconds, each time they change"""
+        previous = None
+        while not self.finished.cancelled():
+            remaining = self.engine.remaining_seconds()
+            if remaining != previous:
+                previous = remaining
+                yield remaining
+                # Time may have been added while the caller had control
+                continue
+            if not self.engine.running:
+                return
+            waiter = self.loop.create_future()
+            self._waiters.append(waiter)
+            if self._tick_handle is None:
+                self._tick_handle = self.loop.call_later(self.engine.seconds_until_next_tick(), self._wake)
+            await waiter
+
+    def _arm(self):
+        if self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+        self._deadline_handle = self.loop.call_at(self.engine.deadline, self._expire)
+
+    def _wake(self):
+        """Resume every iterator; each re-reads the remaining time"""
+        if self._tick_handle is not None:
+            self._tick_handle.cancel()
+            self._tick_handle = None
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _expire(self):
+        self._deadline_handle = None
+        if self.engine.remaining() > 0:
+            # Woken a hair early by the loop's clock resolution
+            self._arm()
+            return
+        self.engine.stop()
+        self._wake()
+        if self.executor is None:
+            self.finished.set_result(None)
+            return
+        # The action runs on a worker thread and reports back through the loop
+        self.executor.execute(lambda result: self.loop.call_soon_threadsafe(self._action_done, result))
+
+    def _action_done(self, result):
+        if not self.finished.done():
+            self.finished.set_result(result)
+
+
+def headless_main(argv=None):
+    """Entry point for `shutaap --headless HH:MM:SS --action ACTION`"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="shutaap --headless",
+                                     description="Run a Shutaap countdown without a display")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("duration", help="time until the action, as HH:MM:SS")
+    parser.add_argument("--action", choices=("shutdown", "restart", "sleep", "nothing"),
+                        default="shutdown", help="system action to run at zero (default: shutdown)")
+    parser.add_argument("--stats", action="store_true",
+                        help="print wakeups per minute and peak memory when done")
+    args = parser.parse_args(argv)
+
+    try:
+        seconds = parse_hms(args.duration)
+    except ValueError as e:
+        parser.error(str(e))
+    action = None if args.action == "nothing" else args.action
+
+    # The configured pre-action hooks run here too; servers need them most
+    from actions import ActionExecutor
+    from config import ConfigStore
+    store = ConfigStore()
+    config = store.load()
+    executor = ActionExecutor()
+    for problem in executor.configure(action, config.hooks, config.hook_deadline, config.hook_workers).problems:
+        print(f"Error: {problem}")
+
+    countdown = HeadlessCountdown(seconds, action, executor=executor)
+    print(f"Shutaap: {args.action} in {format_hms(seconds)}")
+    try:
+        result = countdown.run()
+    except KeyboardInterrupt:
+        print("Shutaap: cancelled")
+        return 1
+    if result is not None:
+        result.report()
+    if args.stats:
+        print(countdown.stats())
+    return 0 if result is None or result.ok else 1
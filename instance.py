@@ -0,0 +1,179 @@
+"""
+Hand a launch over to the Shutaap window that is already running.
+
+A later launch forwards its arguments (add time, set the action, show the
+window) as one JSON line over a local socket and exits, instead of
+building a second window that would fight the first over the audio
+device. This module avoids Qt on Unix so the handoff costs little more
+than starting Python.
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+
+from countdown import parse_hms
+
+TIMEOUT = 0.5
+# Applying a launch can take a while, e.g. to hand the action to the system scheduler
+REPLY_TIMEOUT = 15
+
+
+def runtime_path(file_name):
+    """Path of a per-user file such as a socket, in XDG_RUNTIME_DIR or else the temp directory"""
+    base_path = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base_path, file_name)
+
+
+def server_name():
+    """Per-user address of the running window: a socket path on Unix, a pipe name on Windows"""
+    if os.name == "nt":
+        return "shutaap-%s" % os.environ.get("USERNAME", "user")
+    return runtime_path("shutaap-gui-%d.sock" % os.getuid())
+
+
+def duration(text):
+    try:
+        return parse_hms(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def target_time(text):
+    # Imported on use so a plain launch does not pay for the scheduler backends
+    from scheduler import parse_target
+    try:
+        return parse_target(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def add_launch_arguments(parser):
+    """Options a later launch forwards to the running window"""
+    parser.add_argument("--add", type=duration, metavar="HH:MM:SS",
+                        help="add time to the countdown, starting it if it is not running")
+    parser.add_argument("--at", type=target_time, metavar="HH:MM",
+                        help="count down to this time of day (or 'YYYY-MM-DD HH:MM') instead")
+    parser.add_argument("--hand-off", action="store_true",
+                        help="with --at, let the system scheduler run the action so the clock can be closed")
+    parser.add_argument("--action", choices=("shutdown", "restart", "sleep", "nothing"),
+                        help="set the system action to run at zero")
+    parser.add_argument("--show", action="store_true",
+                        help="bring the clock to the front")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a separate clock even if one is already running")
+
+
+def launch_request(args):
+    """The request a launch with these arguments sends; a bare launch just shows the clock"""
+    request = {"command": "launch"}
+    if args.add:
+        request["add"] = args.add
+    if args.at:
+        request["at"] = args.at.isoformat(sep=" ")
+        request["hand_off"] = args.hand_off
+    if args.action:
+        request["action"] = None if args.action == "nothing" else args.action
+    if args.show or len(request) == 1:
+        request["show"] = True
+    return request
+
+
+def forward(request, name=None):
+    """
+    Send request to the running window.
+
+    Returns:
+        dict: its reply, or None when no window is running. Once a window
+        accepted the connection it may have applied the request, so a
+        missing or late reply is an error and never None.
+    """
+    name = name or server_name()
+    data = json.dumps(request).encode() + b"\n"
+    if os.name == "nt":
+        reply = _forward_pipe(name, data)
+    else:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(TIMEOUT)
+            try:
+                client.connect(name)
+            except OSError:
+                return None
+            try:
+                client.settimeout(REPLY_TIMEOUT)
+                client.sendall(data)
+                with client.makefile("rb") as stream:
+                    reply = stream.readline()
+            except OSError as e:
+                return {"ok": False, "error": f"no reply from the running clock: {e}"}
+    if reply is None:
+        return None
+    try:
+        return json.loads(reply)
+    except ValueError:
+        return {"ok": False, "error": "no reply from the running clock"}
+
+
+def running(name=None):
+    """Whether a window is accepting launches at name; a socket left by a crashed one refuses connections"""
+    name = name or server_name()
+    if os.name == "nt":
+        from PyQt5.QtNetwork import QLocalSocket
+        client = QLocalSocket()
+        client.connectToServer(name)
+        connected = client.waitForConnected(int(TIMEOUT * 1000))
+        client.abort()
+        return connected
+    return socket_alive(name)
+
+
+def socket_alive(path):
+    """Whether a process accepts connections on the Unix socket at path"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(TIMEOUT)
+            client.connect(path)
+    except OSError:
+        return False
+    return True
+
+
+def _forward_pipe(name, data):
+    # QLocalServer uses named pipes on Windows
+    from PyQt5.QtNetwork import QLocalSocket
+    client = QLocalSocket()
+    client.connectToServer(name)
+    if not client.waitForConnected(int(TIMEOUT * 1000)):
+        return None
+    client.write(data)
+    client.waitForBytesWritten(int(REPLY_TIMEOUT * 1000))
+    reply = b""
+    while not reply.endswith(b"\n") and client.waitForReadyRead(int(REPLY_TIMEOUT * 1000)):
+        reply += bytes(client.readAll())
+    client.disconnectFromServer()
+    return reply
+
+
+def handoff(argv):
+    """
+    Forward this launch to a running window.
+
+    Returns:
+        int: exit status when the running window took over, or None when
+        this process should start its own window.
+    """
+    if "-h" in argv or "--help" in argv:
+        return None
+    parser = argparse.ArgumentParser(add_help=False)
+    add_launch_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    if args.new_instance:
+        return None
+    reply = forward(launch_request(args))
+    if reply is None:
+        return None
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}")
+        return 1
+    return 0
@@ -0,0 +1,476 @@
+"""
+Hand a system action over to the operating system's scheduler.
+
+For jobs like "shut down at 02:00" nothing of Shutaap needs to keep
+running: the action becomes a transient systemd timer or an `at` job.
+The job is remembered in the config, so a later window can show the time
+left and move or cancel it.
+"""
+import datetime
+import itertools
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from actions import action_command
+
+TIMEOUT = 10
+STUB_PATH = os.path.join(os.path.expanduser("~"), ".shutaap-stub-jobs.json")
+# Keeps unit names unique while a moved job and the one it replaces both exist
+_unit_numbers = itertools.count(1)
+
+
+def parse_target(text, now=None):
+    """
+    The next moment matching text.
+
+    'HH:MM' and 'HH:MM:SS' mean today, or tomorrow once that time has
+    passed; 'YYYY-MM-DD HH:MM[:SS]' is a fixed date.
+
+    Returns:
+        datetime.datetime: the target in local time.
+
+    Raises:
+        ValueError: if text is not in one of those formats or is in the past.
+    """
+    now = now or datetime.datetime.now()
+    text = text.strip()
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            target = datetime.datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        if target <= now:
+            raise ValueError(f"{text!r} is in the past")
+        return target
+    for time_format in ("%H:%M:%S", "%H:%M"):
+        try:
+            clock_time = datetime.datetime.strptime(text, time_format).time()
+        except ValueError:
+            continue
+        target = datetime.datetime.combine(now.date(), clock_time)
+        if target <= now:
+            target += datetime.timedelta(days=1)
+        return target
+    raise ValueError(f"invalid time: {text!r}")
+
+
+class ScheduledJob:
+    """An action waiting in the system scheduler, as recorded in the config"""
+    def __init__(self, scheduler, job_id, target, action):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.target = target
+        self.action = action
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Raises:
+            ValueError: if a field is missing or has the wrong type.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"scheduled action must be an object: {data!r}")
+        if data.get("scheduler") not in SCHEDULERS or not isinstance(data.get("id"), str):
+            raise ValueError(f"invalid scheduled action: {data!r}")
+        if data.get("action") not in ("shutdown", "restart", "sleep"):
+            raise ValueError(f"invalid scheduled action: {data!r}")
+        try:
+            target = datetime.datetime.fromisoformat(data.get("target"))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid scheduled action time: {data!r}") from None
+        return cls(data["scheduler"], data["id"], target, data["action"])
+
+    def to_json(self):
+        return {
+            "scheduler": self.scheduler,
+            "id": self.job_id,
+            "target": self.target.isoformat(sep=" "),
+            "action": self.action,
+        }
+
+    def remaining(self, now=None):
+        """Seconds until the job runs"""
+        return max(0.0, self.target.timestamp() - (now if now is not None else time.time()))
+
+    def __repr__(self):
+        return f"ScheduledJob({self.scheduler!r}, {self.job_id!r}, {self.target}, {self.action!r})"
+
+
+def _check(completed, what):
+    if completed.returncode != 0:
+        raise OSError(f"{what} failed: {completed.stdout.strip() or completed.returncode}")
+    return completed.stdout
+
+
+class SystemdTimerScheduler:
+    """
+    A transient systemd timer and service.
+
+    It survives the window exiting, but not a reboot. Unless running as
+    root the timer is a user unit, and the action goes through
+    systemctl, which logind lets the logged-in user run.
+    """
+    name = "systemd"
+    COMMANDS = {
+        'shutdown': ['systemctl', 'poweroff'],
+        'restart': ['systemctl', 'reboot'],
+        'sleep': ['systemctl', 'suspend'],
+    }
+
+    def __init__(self, user=None, run=subprocess.run):
+        self.user = user if user is not None else os.geteuid() != 0
+        self.run = run
+
+    @staticmethod
+    def available():
+        return shutil.which("systemd-run") is not None and os.path.isdir("/run/systemd/system")
+
+    def _call(self, program, *args):
+        argv = [program] + (["--user"] if self.user else []) + list(args)
+        try:
+            return self.run(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            raise OSError(f"{program} timed out after {TIMEOUT}s") from None
+
+    def schedule(self, target, action):
+        """Create the timer and return the name of its unit"""
+        unit = "shutaap-%s-%d-%d" % (target.strftime("%Y%m%d%H%M%S"), os.getpid(), next(_unit_numbers))
+        command = self.COMMANDS[action]
+        command = [shutil.which(command[0]) or command[0]] + command[1:]
+        _check(self._call("systemd-run", f"--unit={unit}", f"--on-calendar={target:%Y-%m-%d %H:%M:%S}",
+                          "--timer-property=AccuracySec=1s", "--", *command), "systemd-run")
+        return unit
+
+    def cancel(self, job_id):
+        _check(self._call("systemctl", "stop", f"{job_id}.timer"), "systemctl stop")
+
+    def pending(self, job_id):
+        return self._call("systemctl", "is-active", "--quiet", f"{job_id}.timer").returncode == 0
+
+
+class AtScheduler:
+    """An `at` job, kept by atd across reboots"""
+    name = "at"
+
+    def __init__(self, run=subprocess.run):
+        self.run = run
+
+    @staticmethod
+    def available():
+        return shutil.which("at") is not None
+
+    def _call(self, argv, stdin=None):
+        try:
+            return self.run(argv, input=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, timeout=TIMEOUT)
+        except subprocess.TimeoutExpired:
+            raise OSError(f"{argv[0]} timed out after {TIMEOUT}s") from None
+
+    def schedule(self, target, action):
+        """Queue the job and return its number"""
+        # at jobs run as the user, so go through logind where it exists
+        if shutil.which("systemctl") is not None:
+            command = SystemdTimerScheduler.COMMANDS[action]
+        else:
+            command = action_command(action)
+        script = " ".join(shlex.quote(arg) for arg in command) + "\n"
+        output = _check(self._call(["at", "-t", target.strftime("%Y%m%d%H%M.%S")], script), "at")
+        match = re.search(r"job (\d+)", output)
+        if match is None:
+            raise OSError(f"at did not report a job number: {output.strip()}")
+        return match.group(1)
+
+    def cancel(self, job_id):
+        _check(self._call(["atrm", job_id]), "atrm")
+
+    def pending(self, job_id):
+        output = _check(self._call(["atq"]), "atq")
+        return any(line.split()[:1] == [job_id] for line in output.splitlines())
+
+
+class StubScheduler:
+    """
+    Stands in for the system scheduler in tests and demos.
+
+    Jobs are kept in a JSON file, so a later process can reattach to them
+    as it would to a real timer. Nothing runs on its own: run_due() hands
+    out the jobs whose time has come.
+    """
+    name = "stub"
+
+    def __init__(self, path=STUB_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+
+    @staticmethod
+    def available():
+        return True
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise OSError(f"could not read {self.path}: {e}") from None
+
+    def _write(self, jobs):
+        fd, temp_path = tempfile.mkstemp(prefix=".shutaap-", suffix=".json", dir=os.path.dirname(self.path) or ".")
+        with os.fdopen(fd, "w") as file:
+            json.dump(jobs, file, indent=4)
+        os.replace(temp_path, self.path)
+
+    def schedule(self, target, action):
+        jobs = self._read()
+        job_id = str(max((int(key) for key in jobs), default=0) + 1)
+        jobs[job_id] = {"target": target.timestamp(), "action": action, "command": action_command(action)}
+        self._write(jobs)
+        return job_id
+
+    def cancel(self, job_id):
+        jobs = self._read()
+        if jobs.pop(job_id, None) is None:
+            raise OSError(f"no stub job {job_id}")
+        self._write(jobs)
+
+    def pending(self, job_id):
+        return job_id in self._read()
+
+    def run_due(self, run=None):
+        """
+        Remove the jobs that are due and pass each command to run.
+
+        Returns:
+            list: (job id, command) of every job that was due.
+        """
+        jobs = self._read()
+        now = self.clock()
+        due = [(job_id, job["command"]) for job_id, job in jobs.items() if job["target"] <= now]
+        if due:
+            for job_id, _ in due:
+                del jobs[job_id]
+            self._write(jobs)
+        for _, command in due:
+            if run is not None:
+                run(command)
+        return due
+
+
+def check_hooks(hooks):
+    """
+    Raises:
+        ValueError: if pre-action hooks are configured, which the system
+        scheduler would skip.
+    """
+    if hooks:
+        names = ", ".join(hook.name for hook in hooks)
+        raise ValueError(f"pre-action hooks ({names}) only run while Shutaap is running; "
+                         f"remove them or keep the clock open")
+
+
+SCHEDULERS = {
+    "systemd": SystemdTimerScheduler,
+    "at": AtScheduler,
+    "stub": StubScheduler,
+}
+
+
+def scheduler_for(name):
+    return SCHEDULERS[name]()
+
+
+def default_scheduler():
+    """The best system scheduler on this machine, or None when there is none"""
+    for scheduler in (SystemdTimerScheduler, AtScheduler):
+        if scheduler.available():
+            return scheduler()
+    return None
+
+
+def cancel_job(job):
+    """Remove job from its scheduler unless it already ran or is gone; failures are reported, not raised"""
+    try:
+        scheduler = scheduler_for(job.scheduler)
+        if scheduler.pending(job.job_id):
+            scheduler.cancel(job.job_id)
+    except OSError as e:
+        print(f"Error: could not cancel {job.scheduler} job {job.job_id}: {e}")
+
+
+class JobKeeper:
+    """
+    The job handed to the system scheduler, changed on a worker thread.
+
+    systemd-run, systemctl and at can each take seconds, so none of them
+    runs on the caller's thread. Requests run one at a time, each on the
+    job the previous one left, so quick successive moves add up. Every
+    change is recorded in config_store; on_done(job, error) is then called
+    from the worker with the job now in place (None when there is none)
+    and, if the request failed, why.
+    """
+    def __init__(self, config_store, on_done=None):
+        self.config_store = config_store
+        self.on_done = on_done
+        self.job = config_store.config.scheduled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduler")
+
+    def reattach(self):
+        """Keep the recorded job if it is still pending, else forget it"""
+        if self.job is not None:
+            self._submit(None, self._reattach)
+
+    def hand_off(self, scheduler, target, action):
+        """Schedule action for target, replacing the current job; scheduler None means there is none"""
+        self._submit(f"could not hand {action} to the system scheduler", self._replace, scheduler, target, action)
+
+    def move(self, seconds):
+        """Move the job by seconds, which may be negative"""
+        self._submit("could not move the scheduled action", self._move, seconds)
+
+    def change_action(self, action):
+        self._submit(f"could not schedule {action}", self._change_action, action)
+
+    def cancel(self):
+        self._submit(None, self._forget, True)
+
+    def finished(self):
+        """The job ran; forget it"""
+        self._submit(None, self._forget, False)
+
+    def shutdown(self):
+        """Wait for the requests already made"""
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, failure, function, *args):
+        self._executor.submit(self._call, failure, function, args)
+
+    def _call(self, failure, function, args):
+        error = None
+        try:
+            function(*args)
+        except (OSError, ValueError) as e:
+            error = f"{failure}: {e}"
+        if self.on_done is not None:
+            self.on_done(self.job, error)
+
+    def _replace(self, scheduler, target, action):
+        # Moves need the new job too, so the same rules apply
+        check_hooks(self.config_store.config.hooks)
+        if scheduler is None:
+            raise OSError("no system scheduler available (needs systemd-run or at)")
+        job = ScheduledJob(scheduler.name, scheduler.schedule(target, action), target, action)
+        print(f"Shutaap: {action} at {target} handed to {job.scheduler} (job {job.job_id}); "
+              f"the clock can be closed")
+        # Only now that the new job exists is the one it replaces removed
+        previous, self.job = self.job, job
+        self.config_store.update(scheduled=job)
+        if previous is not None:
+            cancel_job(previous)
+
+    def _move(self, seconds):
+        if self.job is not None:
+            self._replace(scheduler_for(self.job.scheduler), self.job.target + datetime.timedelta(seconds=seconds),
+                          self.job.action)
+
+    def _change_action(self, action):
+        if self.job is not None and action != self.job.action:
+            self._replace(scheduler_for(self.job.scheduler), self.job.target, action)
+
+    def _forget(self, cancel):
+        job, self.job = self.job, None
+        if job is not None:
+            self.config_store.update(scheduled=None)
+            if cancel:
+                cancel_job(job)
+
+    def _reattach(self):
+        job = self.job
+        try:
+            pending = scheduler_for(job.scheduler).pending(job.job_id)
+        except OSError as e:
+            # Left recorded for a later start to check again
+            print(f"Error: could not check {job.scheduler} job {job.job_id}: {e}")
+            self.job = None
+            return
+        if not pending or job.remaining() <= 0:
+            # It ran, or was removed outside Shutaap
+            self._forget(False)
+            return
+        print(f"Shutaap: {job.action} at {job.target} is scheduled with {job.scheduler}")
+
+
+def schedule_main(argv=None):
+    """Entry point for `shutaap --schedule TIME|status|cancel`, which needs neither Qt nor pygame"""
+    import argparse
+    from config import ConfigStore
+
+    parser = argparse.ArgumentParser(prog="shutaap --schedule",
+                                     description="Hand a system action to the system scheduler and exit")
+    parser.add_argument("--schedule", required=True, metavar="TIME",
+                        help="HH:MM, HH:MM:SS or 'YYYY-MM-DD HH:MM' to schedule the action for; "
+                             "'status' to show the scheduled action; 'cancel' to remove it")
+    parser.add_argument("--action", choices=("shutdown", "restart", "sleep"), default="shutdown",
+                        help="system action to run (default: shutdown)")
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS),
+                        help="scheduler to use (default: systemd if running, else at)")
+    args = parser.parse_args(argv)
+
+    store = ConfigStore()
+    store.load()
+    job = store.config.scheduled
+    if args.schedule == "status":
+        if job is None:
+            print("Shutaap: nothing scheduled")
+            return 0
+        try:
+            pending = scheduler_for(job.scheduler).pending(job.job_id)
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+        state = "pending" if pending else "no longer pending"
+        print(f"Shutaap: {job.action} at {job.target} ({job.scheduler} job {job.job_id}, {state})")
+        return 0
+
+    target = None
+    if args.schedule != "cancel":
+        try:
+            target = parse_target(args.schedule)
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            check_hooks(store.config.hooks)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+    scheduler = scheduler_for(args.scheduler) if args.scheduler else default_scheduler()
+    if target is not None and scheduler is None:
+        print("Error: no system scheduler available (needs systemd-run or at)")
+        return 1
+    try:
+        new_job = None
+        if target is not None:
+            # The old job stays until its replacement exists
+            new_job = ScheduledJob(scheduler.name, scheduler.schedule(target, args.action), target, args.action)
+            print(f"Shutaap: {new_job.action} at {new_job.target} ({new_job.scheduler} job {new_job.job_id})")
+        # A job that already ran or was removed by hand only needs forgetting
+        if job is not None and scheduler_for(job.scheduler).pending(job.job_id):
+            scheduler_for(job.scheduler).cancel(job.job_id)
+            print(f"Shutaap: cancelled {job.action} at {job.target}")
+        elif target is None:
+            print("Shutaap: nothing scheduled")
+        job = new_job
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        store.update(scheduled=job)
+        store.flush()
+    return 0
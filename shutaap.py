@@ -1,21 +1,47 @@
-import sys, json
-import pygame
+import time
+_IMPORT_START = time.perf_counter()
+
+import sys
+
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    # Headless runs need neither Qt nor pygame, so hand off before importing them
+    from countdown import headless_main
+    sys.exit(headless_main(sys.argv[1:]))
+
+if __name__ == "__main__" and any(arg.split("=")[0] == "--schedule" for arg in sys.argv[1:]):
+    # Handing an action to the system scheduler needs no window either
+    from scheduler import schedule_main
+    sys.exit(schedule_main(sys.argv[1:]))
+
+if __name__ == "__main__":
+    # A clock is probably running already; let it handle this launch
+    from instance import handoff
+    _status = handoff(sys.argv[1:])
+    if _status is not None:
+        sys.exit(_status)
+
+import json, argparse, math, hashlib, datetime
+from contextlib import contextmanager
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, 
     QLabel, QLineEdit, QPushButton, 
-    QMessageBox, QApplication, QMainWindow, QComboBox
+    QMessageBox, QApplication, QMainWindow, QComboBox, QCheckBox
 )
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPainter, QPixmap, QColor, QPainterPath
-from PyQt5.QtCore import Qt, QTimer, QTime, QPoint, QRunnable, QThreadPool, pyqtSignal, QObject
-
-COUNTDOWN = 0
-CONFIGURATION = 10
+from PyQt5.QtGui import QPainter, QPixmap, QImageReader, QColor, QPen, QRegion, QTransform
+from PyQt5.QtCore import (Qt, QEvent, QTimer, QPoint, QRect, QRectF, QStandardPaths, QFileSystemWatcher, pyqtSignal, QObject,
+                          QByteArray, QDataStream, QIODevice)
+from PyQt5.QtNetwork import QLocalServer
 
-import platform
 import os
 
-import subprocess
+from actions import ActionExecutor, DryRunBackend
+from audio import AudioThread, SoundBank, premix_available
+from config import ConfigStore
+from instance import add_launch_arguments, handoff, launch_request, running, server_name
+from countdown import Cue, CountdownEngine, CueTimeline, monotonic_clock
+from scheduler import SCHEDULERS, JobKeeper, default_scheduler, parse_target, scheduler_for
+from tracer import NULL_TRACER, Tracer
 
 def resource_path(relative_path):
     """
@@ -24,171 +50,854 @@ def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
     return os.path.join(base_path, relative_path)
 
-def shutdown_system(action='shutdown'):
+def cache_path(*parts):
     """
-    Perform system action based on user selection, cross-platform compatible.
-    
-    Args:
-        action (str): Desired system action ('shutdown', 'restart', 'sleep').
+    Get a path inside the per-user cache directory.
     """
-    try:
-        if action is None:
-            return
-        system = platform.system()
-        if system == "Windows":
-            action_map = {
-                'shutdown': ['shutdown', '/s', '/t', '1'],
-                'restart': ['shutdown', '/r', '/t', '1'],
-                'sleep': ['rundll32.exe', 'powrprof.dll,SetSuspendState', '0,1,0']
-            }
-        elif system == "Linux":
-            action_map = {
-                'shutdown': ['shutdown', '-h', 'now'],
-                'restart': ['shutdown', '-r', 'now'],
-                'sleep': ['systemctl', 'suspend']
-            }
-        elif system == "Darwin":  # macOS
-            action_map = {
-                'shutdown': ['shutdown', '-h', 'now'],
-                'restart': ['shutdown', '-r', 'now'],
-                'sleep': ['pmset', 'sleepnow']
-            }
-        else:
-            raise OSError(f"Unsupported OS: {system}")
-        
-        subprocess.run(action_map.get(action, action_map['shutdown']), check=True)
-    except Exception as e:
-        print(f"Error: {e}")
+    base_path = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not base_path:
+        base_path = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_path, "shutaap", *parts)
 
-class SoundWorker(QRunnable):
-    def __init__(self, sound_path, start_time=0, loop=False):
-        super().__init__()
-        self.sound_path = sound_path
-        self.start_time = start_time
-        self.loop = loop
-
-    def run(self):
-        sound = pygame.mixer.Sound(self.sound_path)
-        if self.loop:
-            sound.play(-1)
-        else:
-            pygame.mixer.music.load(self.sound_path)
-            pygame.mixer.music.play(start=self.start_time)
+class StartupProfiler:
+    """
+    Wall time of each startup phase, printed once the window has painted
+    and the audio device is open.
+    """
+    def __init__(self, origin, enabled=False):
+        self.origin = origin
+        self.enabled = enabled
+        self.phases = []
+        self.reported = False
+        self.shown_at = origin
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.phases.append((name, seconds))
+
+    def mark_shown(self):
+        """Start timing the first paint"""
+        self.shown_at = time.perf_counter()
+
+    def recorded(self, name):
+        return any(phase == name for phase, _ in self.phases)
+
+    def report(self, *required):
+        """Print the breakdown once every required phase has been recorded"""
+        if not self.enabled or self.reported:
+            return
+        if not all(self.recorded(name) for name in required):
+            return
+        self.reported = True
+        print("Startup profile:")
+        for name, seconds in self.phases:
+            print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':<24} {(time.perf_counter() - self.origin) * 1000:8.1f} ms")
 
 class ClockSignals(QObject):
-    countdown_updated = pyqtSignal(QTime)
+    countdown_updated = pyqtSignal(int)
     countdown_finished = pyqtSignal()
+    audio_ready = pyqtSignal()
+    action_finished = pyqtSignal(object)
+    hook_progress = pyqtSignal(object, int, int)
+    schedule_changed = pyqtSignal(object, object)
+
+class ScaledImageCache:
+    """
+    Already-scaled copies of the image assets, kept in the user cache.
+
+    Entries are keyed by the SHA-1 of the source file and the target size the
+    scale factor produces, so editing an asset or changing the scale simply
+    misses and replaces the stale entry. Warm starts load the small cached
+    PNG instead of decoding and smooth-scaling the full-resolution source.
+
+    Images are kept at their logical size with a device pixel ratio of 1:
+    the window lays itself out from pixmap sizes, which count device
+    pixels, so high-DPI copies would make it twice as large.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.load_times = {}
+        # Cache key of each loaded asset, which identifies its source and size
+        self.keys = {}
+
+    @staticmethod
+    def source_size(relative_path):
+        """Size of a source image, read from its header without decoding"""
+        return QImageReader(resource_path(relative_path)).size()
+
+    def load(self, relative_path, width, height):
+        """The asset scaled to fit width x height, keeping its aspect ratio"""
+        start = time.perf_counter()
+        with open(resource_path(relative_path), "rb") as file:
+            data = file.read()
+        stem = "%s-%s" % (
+            os.path.splitext(os.path.basename(relative_path))[0], hashlib.sha1(data).hexdigest()[:16])
+        key = "%s-%dx%d.png" % (stem, width, height)
+        cached_file = os.path.join(self.cache_dir, key)
+        self.keys[relative_path] = key
+
+        pixmap = QPixmap(cached_file) if os.path.isfile(cached_file) else QPixmap()
+        warm = not pixmap.isNull()
+        if not warm:
+            source = QPixmap()
+            source.loadFromData(data)
+            pixmap = source.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self._store(stem, cached_file, pixmap)
+
+        self.load_times[relative_path] = (time.perf_counter() - start, "warm" if warm else "cold")
+        return pixmap
+
+    def _store(self, stem, cached_file, pixmap):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Drop entries scaled from older versions of this asset
+            asset = stem.rsplit("-", 1)[0] + "-"
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(asset) and not name.startswith(stem):
+                    os.remove(os.path.join(self.cache_dir, name))
+            temp_file = cached_file + ".tmp"
+            if pixmap.save(temp_file, "PNG"):
+                os.replace(temp_file, cached_file)
+        except OSError as e:
+            print(f"Error: could not cache {cached_file}: {e}")
+
+    def stats(self):
+        """Load time per asset in milliseconds, with whether it was a warm or cold load"""
+        return {
+            path: {"ms": round(seconds * 1000, 2), "start": kind}
+            for path, (seconds, kind) in self.load_times.items()
+        }
+
+class WindowShapeCache:
+    """
+    Window shapes kept in the user cache as serialized QRegions.
+
+    Turning the static layer's alpha channel into a region scans every
+    pixel. The region only depends on the scaled assets and where they are
+    drawn, so it is stored under a hash of their cache keys and read back
+    on later starts.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.last_load = None
+
+    @staticmethod
+    def compute(pixmap):
+        """The region covered by the opaque pixels of pixmap"""
+        return QRegion(pixmap.mask())
+
+    def load(self, pixmap, *key_parts):
+        """The shape of pixmap, from the cache when it was computed before"""
+        start = time.perf_counter()
+        key = hashlib.sha1("|".join(str(part) for part in key_parts).encode()).hexdigest()[:16]
+        cached_file = os.path.join(self.cache_dir, "shape-%s.region" % key)
+        region = self._read(cached_file)
+        warm = region is not None
+        if not warm:
+            region = self.compute(pixmap)
+            self._store(cached_file, region)
+        self.last_load = (time.perf_counter() - start, "warm" if warm else "cold")
+        return region
+
+    def _read(self, cached_file):
+        try:
+            with open(cached_file, "rb") as file:
+                data = QByteArray(file.read())
+        except OSError:
+            return None
+        region = QRegion()
+        stream = QDataStream(data, QIODevice.ReadOnly)
+        stream >> region
+        if stream.status() != QDataStream.Ok:
+            print(f"Error: {cached_file} is corrupted, recomputing the window shape")
+            return None
+        return region
+
+    def _store(self, cached_file, region):
+        data = QByteArray()
+        stream = QDataStream(data, QIODevice.WriteOnly)
+        stream << region
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # One window shape is current at a time
+            for name in os.listdir(self.cache_dir):
+                if name.startswith("shape-"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            temp_file = cached_file + ".tmp"
+            with open(temp_file, "wb") as file:
+                file.write(bytes(data))
+            os.replace(temp_file, cached_file)
+        except OSError as e:
+            print(f"Error: could not cache {cached_file}: {e}")
+
+class HandSpriteCache:
+    """
+    Pre-rotated copies of one clock hand, one per discrete angle.
+
+    The hand pivots around the middle of its bottom edge. Sprites are
+    rendered on first use, cropped to the rotated bounds, and blitted
+    without any further transform afterwards. Angles between steps, or new
+    steps once max_bytes is used up, fall back to rotating live.
+    """
+    def __init__(self, pixmap, steps, max_bytes=16 * 1024 * 1024):
+        self.pixmap = pixmap
+        self.steps = steps
+        self.max_bytes = max_bytes
+        self.sprites = {}
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def hand_rect(self):
+        """Hand rectangle relative to the pivot, before rotation"""
+        return QRectF(-(self.pixmap.width() // 2), -self.pixmap.height(),
+                      self.pixmap.width(), self.pixmap.height())
+
+    def bounds(self, angle):
+        """Rectangle covered by the hand at angle, relative to the pivot"""
+        return QTransform().rotate(angle).mapRect(self.hand_rect()).toAlignedRect()
+
+    def step_for(self, angle):
+        """Step index for angle, or None if angle falls between steps"""
+        position = angle * self.steps / 360
+        step = round(position)
+        if abs(position - step) > 1e-6:
+            return None
+        return step % self.steps
+
+    def draw(self, painter, pivot_x, pivot_y, angle):
+        step = self.step_for(angle)
+        sprite = self.sprites.get(step)
+        if sprite is None and step is not None:
+            sprite = self._render(step)
+        if sprite is None:
+            self.misses += 1
+            painter.save()
+            painter.translate(pivot_x, pivot_y)
+            painter.rotate(angle)
+            painter.drawPixmap(-(self.pixmap.width() // 2), -self.pixmap.height(), self.pixmap)
+            painter.restore()
+            return
+        self.hits += 1
+        offset, pixmap = sprite
+        painter.drawPixmap(pivot_x + offset.x(), pivot_y + offset.y(), pixmap)
+
+    def _render(self, step):
+        angle = step * 360 / self.steps
+        rect = self.bounds(angle)
+        size = rect.width() * rect.height() * 4
+        if self.memory_bytes + size > self.max_bytes:
+            return None
+        pixmap = QPixmap(rect.size())
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(-rect.x(), -rect.y())
+        painter.rotate(angle)
+        painter.drawPixmap(-(self.pixmap.width() // 2), -self.pixmap.height(), self.pixmap)
+        painter.end()
+        self.sprites[step] = (rect.topLeft(), pixmap)
+        self.memory_bytes += size
+        return self.sprites[step]
+
+def quantize_angle(seconds, period, steps):
+    """Hand angle for seconds remaining, snapped to one of steps positions per period"""
+    step = math.ceil(seconds * steps / period - 1e-9) % steps
+    return step * 360 / steps
+
+def seconds_until_step(seconds, period, steps):
+    """Time until the quantized hand position for seconds next changes"""
+    step_time = period / steps
+    return seconds - (math.ceil(seconds / step_time - 1e-9) - 1) * step_time
+
+class InstanceServer(QObject):
+    """
+    Accept launches forwarded by later starts of the app and apply them to the window.
+
+    The server can listen before the window exists, so that two clocks
+    started together cannot both build one; connections are only served
+    once the event loop runs, by which time attach() has set the window.
+    """
+    def __init__(self, window=None, name=None):
+        super().__init__(window)
+        self.window = window
+        self.name = name or server_name()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+
+    def attach(self, window):
+        self.window = window
+        self.setParent(window)
+
+    def listen(self):
+        """
+        Returns:
+            bool: False when another clock holds the name or it cannot be claimed.
+        """
+        # With access options set, listen() replaces whatever holds the name
+        if running(self.name):
+            return False
+        if not self.server.listen(self.name):
+            # Left behind by a clock that did not exit cleanly
+            QLocalServer.removeServer(self.name)
+            if not self.server.listen(self.name):
+                print(f"Error: cannot accept launches on {self.name}: {self.server.errorString()}")
+                return False
+        return True
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.disconnected.connect(connection.deleteLater)
+            connection.readyRead.connect(lambda connection=connection: self.read(connection))
+
+    def read(self, connection):
+        if not connection.canReadLine():
+            return
+        try:
+            request = json.loads(bytes(connection.readLine()))
+            reply = self.window.handle_launch(request)
+        except (ValueError, TypeError) as e:
+            reply = {"ok": False, "error": str(e)}
+        connection.write(json.dumps(reply).encode() + b"\n")
+        connection.flush()
+        connection.disconnectFromServer()
+
+class WakeupMeter:
+    """Timer wakeups counted separately for each display mode"""
+    def __init__(self, mode, clock=time.monotonic):
+        self.clock = clock
+        self.mode = mode
+        self.since = clock()
+        self.wakeups = {}
+        self.seconds = {}
+
+    def wake(self):
+        self.wakeups[self.mode] = self.wakeups.get(self.mode, 0) + 1
+
+    def set_mode(self, mode):
+        now = self.clock()
+        self.seconds[self.mode] = self.seconds.get(self.mode, 0.0) + now - self.since
+        self.mode, self.since = mode, now
+
+    def stats(self):
+        """Wakeups, minutes and wakeups per minute for every mode seen so far"""
+        seconds = dict(self.seconds)
+        seconds[self.mode] = seconds.get(self.mode, 0.0) + self.clock() - self.since
+        return {
+            mode: {
+                "wakeups": self.wakeups.get(mode, 0),
+                "minutes": round(elapsed / 60, 3),
+                "wakeups_per_minute": round(self.wakeups.get(mode, 0) * 60 / elapsed, 3) if elapsed else 0.0,
+            }
+            for mode, elapsed in seconds.items()
+        }
+
+class FrameScheduler(QObject):
+    """
+    Frame clock for smooth animation.
+
+    Frames are paced on the screen refresh interval (Qt widgets expose no
+    vsync signal, so a precise timer at the refresh rate stands in for it).
+    Whenever the average paint time exceeds the frame budget the scheduler
+    drops to the next lower rate, and it climbs back once painting is cheap
+    again, so it never falls behind. Callers may also ask for a later frame
+    when nothing visible changes sooner.
+    """
+    frame = pyqtSignal()
+
+    RATES = (60, 30, 20, 15, 10)
+    BUDGET = 0.5        # fraction of a frame interval that painting may use
+    RECOVER_FRAMES = 120
+
+    def __init__(self, refresh_rate=60, parent=None):
+        super().__init__(parent)
+        self.rates = tuple(rate for rate in self.RATES if rate <= refresh_rate) or self.RATES[-1:]
+        self.rate_index = 0
+        self.paint_average = 0.0
+        self.paint_max = 0.0
+        self.frames = 0
+        self.dropped_frames = 0
+        self._cheap_frames = 0
+        self._due = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+
+    @property
+    def fps(self):
+        return self.rates[self.rate_index]
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def start(self, delay=0.0):
+        """Request the next frame no earlier than delay seconds from now"""
+        frames = max(1, math.ceil(delay / self.interval - 1e-9))
+        wait = frames * self.interval
+        self._due = time.perf_counter() + wait
+        self._timer.start(int(wait * 1000))
+
+    def stop(self):
+        self._timer.stop()
+        self._due = None
+
+    def _on_timeout(self):
+        late = time.perf_counter() - self._due
+        if late > self.interval:
+            self.dropped_frames += int(late / self.interval)
+        self.frames += 1
+        self.frame.emit()
+
+    def paint_finished(self, duration):
+        """Feed the duration of one paint, in seconds, into the rate control"""
+        self.paint_average += (duration - self.paint_average) * 0.1
+        self.paint_max = max(self.paint_max, duration)
+        if duration > self.interval:
+            self.dropped_frames += 1
+        if self.paint_average > self.interval * self.BUDGET and self.rate_index + 1 < len(self.rates):
+            self.rate_index += 1
+            self._cheap_frames = 0
+        elif self.rate_index and self.paint_average < 1.0 / self.rates[self.rate_index - 1] * self.BUDGET / 2:
+            self._cheap_frames += 1
+            if self._cheap_frames >= self.RECOVER_FRAMES:
+                self.rate_index -= 1
+                self._cheap_frames = 0
+
+    def stats(self):
+        return {
+            "fps": self.fps,
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "paint_avg_ms": round(self.paint_average * 1000, 3),
+            "paint_max_ms": round(self.paint_max * 1000, 3),
+        }
 
 class ShutdownTimerApp(QMainWindow):
-    def __init__(self, scale_factor=1.0):
+    # Discrete hand positions cached as pre-rotated sprites
+    MINUTE_HAND_STEPS = 3600
+    SECOND_HAND_STEPS = 60
+    # Finer second-hand positions used by the smooth animation mode
+    SMOOTH_SECOND_HAND_STEPS = 360
+    # Longest idle sleep, so a timer paused by suspend is re-armed promptly
+    IDLE_MAX_SLEEP = 60.0
+    # Only sounds this close to zero are premixed, which bounds the buffer
+    PREMIX_MAX_SECONDS = 30
+
+    def __init__(self, scale_factor=1.0, debug_dirty=False, smooth=False, shake_mode="paint",
+                 profiler=None, action_backend=None, tracer=NULL_TRACER, clock=monotonic_clock,
+                 timer_factory=QTimer, audio=None, config_store=None, action_executor=None, scheduler=None,
+                 cache_dir=None):
+        """
+        The clock, timer factory, audio player, config store and action
+        executor default to the real ones; simulate.py swaps them for
+        virtual stand-ins to fast-forward whole countdowns. scheduler is the
+        system scheduler hand_off() uses, by default the best available.
+        cache_dir replaces the per-user cache directory.
+        """
         super().__init__()
-        pygame.mixer.init()
-        self.threadpool = QThreadPool()
+        self.profiler = profiler or StartupProfiler(_IMPORT_START)
+        cache_dir = cache_dir or cache_path()
+        self.tracer = tracer
+        self.signals = ClockSignals()
+        self.signals.audio_ready.connect(self.on_audio_ready)
+        # Configuration lives in memory; saves happen in the background
+        if config_store is None:
+            config_store = ConfigStore()
+            config_store.load()
+        self.config_store = config_store
+        # The mixer is opened in the background after the first paint
+        if audio is None:
+            budget_bytes = int(self.config_store.config.audio_budget_mb * 1024 * 1024)
+            audio = AudioThread(SoundBank(resource_path('sounds'), budget_bytes),
+                                on_ready=self.signals.audio_ready.emit,
+                                tracer=tracer, cache_dir=os.path.join(cache_dir, "audio"))
+        self.audio = audio
+        # With NumPy the end sequence is mixed ahead of time and plays as one sound
+        self.premix = premix_available()
+        self.first_paint_done = False
         self.on = False
         # Initialize window properties
         self.setWindowTitle("Shutdown Timer")
 
-        config_path = os.path.join(os.path.expanduser("~"), "shutdown_timer_config.json")
+        self.config_watcher = QFileSystemWatcher(self)
+        self.config_watcher.fileChanged.connect(self.on_config_file_changed)
+        self.config_watcher.directoryChanged.connect(self.on_config_file_changed)
+        self.watch_config_file()
 
-        try:
-            if os.path.isfile(config_path):
-                global CONFIGURATION
-                with open(config_path) as file:
-                    data = json.load(file)
-                CONFIGURATION = data["total increase in timer"]
-                self.system_action = data["system action"]
-            else:
-                self.system_action = "shutdown"
-        except:
-            self.system_action = "shutdown"
+        # The system action is resolved up front and run off the GUI thread
+        self.signals.action_finished.connect(self.on_action_finished)
+        self.signals.hook_progress.connect(self.on_hook_progress)
+        self.hook_status = ""
+        self.action_executor = action_executor or ActionExecutor(action_backend)
+        self.configure_action()
         
-        # Load and scale clock image
-        original_pixmap = QPixmap(resource_path("images/clock.png"))
-        new_width = int(original_pixmap.width() * scale_factor)
-        new_height = int(original_pixmap.height() * scale_factor)
-        self.clock_shape = original_pixmap.scaled(
-            new_width, new_height,
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
+        # Load the scaled images, from the user cache when they were scaled before
+        with self.profiler.phase("image decode"):
+            self.image_cache = ScaledImageCache(os.path.join(cache_dir, "images"))
+            original_size = ScaledImageCache.source_size("images/clock.png")
+            new_width = int(original_size.width() * scale_factor)
+            new_height = int(original_size.height() * scale_factor)
+            self.clock_shape = self.image_cache.load("images/clock.png", new_width, new_height)
 
-        self.red_btn_pos_x = new_width // 2 - 20
+            self.red_btn_pos_x = new_width // 2 - 20
 
-        # Load red button image
-        red_button_pixmap = QPixmap(resource_path("images/red-button.png")).scaled(
-            int(new_width * 0.15),  # Smaller button size
-            int(new_height * 0.15),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
-        self.red_button = red_button_pixmap
+            # Load red button image
+            self.red_button = self.image_cache.load(
+                "images/red-button.png",
+                int(new_width * 0.15),  # Smaller button size
+                int(new_height * 0.15)
+            )
 
-        # Create a custom mask that includes the red button
-        full_mask = QPixmap(self.clock_shape.size())
-        full_mask.fill(Qt.transparent)
+            # Load hand images
+            self.minute_hand_image = self.image_cache.load(
+                "images/hour_hand.png",
+                int(original_size.width() * scale_factor * 0.20),
+                int(original_size.height() * scale_factor * 0.20)
+            )
     
-        painter = QPainter(full_mask)
-        painter.drawPixmap(0, 0, self.clock_shape)
-        # Ensure red button area is also transparent
-        painter.drawPixmap(self.red_btn_pos_x, 0, self.red_button)
-        painter.end()
+            self.second_hand_image = self.image_cache.load(
+                "images/minute_hand.png",
+                int(original_size.width() * scale_factor * 0.35),
+                int(original_size.height() * scale_factor * 0.35)
+            )
+
+        for path, (seconds, kind) in self.image_cache.load_times.items():
+            self.profiler.record(f"  {os.path.basename(path)} ({kind})", seconds)
+
+        with self.profiler.phase("mask build"):
+            # Pre-blend the static layers; the same pixmap gives the window mask
+            self.static_layer = QPixmap(self.clock_shape.size())
+            self.static_layer.fill(Qt.transparent)
+    
+            painter = QPainter(self.static_layer)
+            painter.drawPixmap(0, 0, self.clock_shape)
+            # Ensure red button area is also transparent
+            painter.drawPixmap(self.red_btn_pos_x, 0, self.red_button)
+            painter.end()
 
-        # Set the new mask
-        self.setFixedSize(full_mask.size())
-        self.setWindowFlags(Qt.FramelessWindowHint)
-        self.setMask(full_mask.mask())
+            # Set the new mask, read from the cache when this layout was seen before
+            self.shape_cache = WindowShapeCache(os.path.join(cache_dir, "masks"))
+            self.window_shape_key = (
+                self.image_cache.keys["images/clock.png"],
+                self.image_cache.keys["images/red-button.png"],
+                self.red_btn_pos_x,
+            )
+            window_shape = self.shape_cache.load(self.static_layer, *self.window_shape_key)
+            self.setFixedSize(self.static_layer.size())
+            self.setWindowFlags(Qt.FramelessWindowHint)
+            self.setMask(window_shape)
         
         # Countdown state
-        self.countdown_time = QTime(0, 0, 0)
-        self.not_alarm = self.not_countdown = True
+        self.countdown = CountdownEngine(clock)
+        self.remaining_seconds = 0
+        # Remaining time the hands and red region currently show
+        self.display_seconds = 0
+        self.configure_cues()
         
         # Total countdown time for red region rising
         self.total_countdown_seconds = 0
 
-        # Load hand images
-        self.minute_hand_image = QPixmap(resource_path(resource_path("images/hour_hand.png"))).scaled(
-            int(original_pixmap.width() * scale_factor * 0.20),
-            int(original_pixmap.height() * scale_factor * 0.20),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        )
-    
-        self.second_hand_image = QPixmap(resource_path(resource_path("images/minute_hand.png"))).scaled(
-            int(original_pixmap.width() * scale_factor * 0.35),
-            int(original_pixmap.height() * scale_factor * 0.35),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
+        self.minute_hand_sprites = HandSpriteCache(self.minute_hand_image, self.MINUTE_HAND_STEPS)
+        self.second_hand_sprites = HandSpriteCache(
+            self.second_hand_image,
+            self.SMOOTH_SECOND_HAND_STEPS if smooth else self.SECOND_HAND_STEPS
         )
         print(self.system_action)
-        # Vibration setup
-        self.original_position = self.pos()
+
+        # Dirty-rectangle debug overlay
+        self.debug_dirty = debug_dirty
+        self.painted_pixels = 0
+        self.debug_outlined = QRegion()
+        self.debug_label_rect = QRect(self.width() // 2 - 60, self.height() * 2 // 3, 120, 16)
+        self.hook_label_rect = QRect(self.width() // 2 - 90, self.height() // 3, 180, 16)
+
+        # Vibration setup: "paint" shakes the drawing, "window" moves the window
+        self.shake_mode = shake_mode
+        self.shake_offset = QPoint()
+        self.original_position = None
         self.vibration_offset = [QPoint(-5, 0), QPoint(5, 0), QPoint(0, -5), QPoint(0, 5)]
         self.vibration_index = 0
-        self.vibration_timer = QTimer(self)
+        self.vibrating = False
+        self.vibration_timer = timer_factory(self)
         self.vibration_timer.timeout.connect(self.vibrate)
 
-        # Main timer
-        self.timer = QTimer(self)
+        # Main timer, re-armed on every tick for the next whole-second boundary
+        self.timer = timer_factory(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_clock)
 
+        # Smooth mode animates the display from the exact remaining time
+        self.smooth = smooth
+        self.frame_scheduler = None
+        if smooth:
+            screen = QApplication.primaryScreen()
+            refresh_rate = screen.refreshRate() if screen is not None else 60
+            self.frame_scheduler = FrameScheduler(refresh_rate, self)
+            self.frame_scheduler.frame.connect(self.animate_frame)
+
+        # While the window cannot be seen nothing is painted and the timer
+        # only wakes for cues and the deadline
+        self.idle = False
+        self.wakeups = WakeupMeter("visible", clock)
+        self.watching_exposure = False
+
+        # An action handed to the system scheduler runs there, not here;
+        # the scheduler is only called off the GUI thread
+        self.scheduler = scheduler
+        self.scheduled = None
+        self.signals.schedule_changed.connect(self.on_schedule_changed)
+        self.job_keeper = JobKeeper(self.config_store, self.signals.schedule_changed.emit)
+        self.job_keeper.reattach()
+
+    @property
+    def system_action(self):
+        return self.config_store.config.system_action
+
+    def watch_config_file(self):
+        """Watch the config file, or its directory until the file exists"""
+        path = self.config_store.path
+        watched = self.config_watcher.files() + self.config_watcher.directories()
+        if watched:
+            self.config_watcher.removePaths(watched)
+        self.config_watcher.addPath(path if os.path.isfile(path) else os.path.dirname(path))
+
+    def on_config_file_changed(self, path):
+        """Pick up edits made to the config file by other programs"""
+        # Atomic replaces swap the inode, so the watch has to be renewed
+        self.watch_config_file()
+        if self.config_store.reload_if_changed():
+            self.configure_action()
+            self.configure_cues()
+
+    def configure_cues(self):
+        """Compile the configured cues into the timeline update_clock walks"""
+        cues = self.config_store.config.cues
+        self.sequence_cues = ()
+        self.sequence_seconds = 0
+        mixed = [cue for cue in cues if cue.sound and cue.offset <= self.PREMIX_MAX_SECONDS]
+        if self.premix and mixed:
+            # The sounds are mixed into one sequence that starts at the earliest of them;
+            # sounds further from zero still play on their own
+            self.sequence_seconds = max(cue.offset for cue in mixed)
+            self.sequence_cues = tuple((self.sequence_seconds - cue.offset, cue.sound, cue.loop) for cue in mixed)
+            cues = ([Cue(cue.offset, vibrate=cue.vibrate) for cue in cues if cue.vibrate is not None]
+                    + [Cue(cue.offset, cue.sound, cue.loop) for cue in cues
+                       if cue.sound and cue.offset > self.PREMIX_MAX_SECONDS])
+            cues.append(Cue(self.sequence_seconds, AudioThread.SEQUENCE))
+        self.timeline = CueTimeline(cues)
+        if self.countdown.running:
+            self.timeline.rewind(self.countdown.remaining_seconds())
+
+    def configure_action(self):
+        """Resolve the configured system action and report anything that will stop it"""
+        config = self.config_store.config
+        resolved = self.action_executor.configure(self.system_action, config.hooks,
+                                                  config.hook_deadline, config.hook_workers)
+        for problem in resolved.problems:
+            print(f"Error: {problem}")
+        return resolved
+
+    def on_action_finished(self, result):
+        """Report the outcome of the system action run at zero"""
+        self.set_hook_status("")
+        result.report()
+        if result.action is None or result.ok:
+            return
+        QMessageBox.warning(self, "System Action Failed",
+                            f"Could not {result.action}:\n{result.error or result.output.strip()}")
+
+    def on_hook_progress(self, result, done, total):
+        """Show how many pre-action hooks have finished"""
+        failed = "" if result.ok else f" ({result.name}: {result.status()})"
+        self.set_hook_status(f"Hooks {done}/{total}{failed}" if done < total else "")
+
+    def set_hook_status(self, text):
+        if text == self.hook_status:
+            return
+        self.hook_status = text
+        self.update(self.hook_label_rect)
+
+    def start_audio(self):
+        """Open the mixer on the audio thread, which then decodes every sound while idle"""
+        self.audio.start()
+
+    def on_audio_ready(self):
+        for name, seconds in self.audio.timings.items():
+            self.profiler.record(name, seconds)
+        self.profiler.report("first paint", "mixer init")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        handle = self.windowHandle()
+        if handle is not None and not self.watching_exposure:
+            # Covered and locked-screen windows only report it through expose events
+            handle.installEventFilter(self)
+            self.watching_exposure = True
+        # isExposed() is still false while the show is being handled; look
+        # again once it is done rather than going idle on a window being shown
+        QTimer.singleShot(0, self.check_visibility)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.check_visibility()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.check_visibility()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Expose:
+            # The window's exposed state is updated once the event is handled
+            QTimer.singleShot(0, self.check_visibility)
+        return super().eventFilter(watched, event)
+
+    def check_visibility(self):
+        """Switch between the normal and idle modes to match whether the window can be seen"""
+        handle = self.windowHandle()
+        visible = self.isVisible() and not self.isMinimized() and (handle is None or handle.isExposed())
+        self.set_idle(not visible)
+
+    def set_idle(self, idle):
+        if idle == self.idle:
+            return
+        self.idle = idle
+        self.wakeups.set_mode("hidden" if idle else "visible")
+        if idle:
+            self.vibration_timer.stop()
+            if self.frame_scheduler is not None:
+                self.frame_scheduler.stop()
+            if self.countdown.running:
+                self.schedule_tick()
+            return
+        # Catch up at once: run any cue that is due and redraw the current time
+        if self.countdown.running:
+            self.timer.stop()
+            self.update_clock()
+            if self.frame_scheduler is not None and self.countdown.running:
+                self.frame_scheduler.start()
+        if self.vibrating:
+            self.vibration_timer.start(100)
+        self.show_remaining(self.remaining_seconds)
+
+    def closeEvent(self, event):
+        """Release the audio device and save pending settings when the window closes"""
+        self.audio.shutdown()
+        # A job being scheduled is recorded before the config is saved
+        self.job_keeper.shutdown()
+        self.config_store.flush()
+        super().closeEvent(event)
+
     def mousePressEvent(self, event):
         """Handle mouse clicks for red button"""
-        global COUNTDOWN, CONFIGURATION
         if event.button() == Qt.LeftButton:
             # Check if click is within red button area
             if (event.x() >= self.red_btn_pos_x and 
                 event.x() <= self.red_btn_pos_x + self.red_button.width() and 
                 event.y() <= self.red_button.height()):
-                COUNTDOWN += CONFIGURATION
-                if COUNTDOWN > 0:
-                    self.on = True
-                    self.stop_vibration()
-                    self.stop_background_sound()
-                    self.start_countdown(COUNTDOWN)
+                self.add_time(self.config_store.config.timer_increase)
             else:
                 button_rect = self.red_button.rect()
                 if button_rect.contains(event.pos()):
-                    CONFIGURATION, self.system_action = self.configure_countdown_time()
+                    self.configure_countdown_time()
+
+    def add_time(self, seconds):
+        """Add seconds to the countdown, starting it if it is not running"""
+        if self.scheduled is not None:
+            # Move the system job; the clock follows once it has moved
+            self.job_keeper.move(seconds)
+            return
+        total_seconds = self.countdown.remaining_seconds() + seconds
+        if total_seconds > 0:
+            self.on = True
+            self.stop_vibration()
+            self.stop_background_sound()
+            self.start_countdown(total_seconds)
+
+    def handle_launch(self, request):
+        """Apply the arguments of a launch, including ones forwarded by later starts"""
+        if request.get("command") != "launch":
+            return {"ok": False, "error": f"unknown command {request.get('command')!r}"}
+        if "action" in request:
+            if request["action"] not in ("shutdown", "restart", "sleep", None):
+                return {"ok": False, "error": f"invalid system action: {request['action']!r}"}
+            self.config_store.update(system_action=request["action"])
+            self.configure_action()
+            if self.scheduled is not None:
+                if request["action"] is None:
+                    self.cancel_hand_off()
+                else:
+                    self.job_keeper.change_action(request["action"])
+        if request.get("at"):
+            self.start_at(datetime.datetime.fromisoformat(request["at"]), request.get("hand_off", False))
+        if request.get("add"):
+            self.add_time(int(request["add"]))
+        if request.get("show"):
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+        return {"ok": True, "remaining": self.countdown.remaining_seconds(), "action": self.system_action}
+
+    def start_at(self, target, hand_off=False):
+        """Count down to a wall-clock time, optionally letting the system scheduler run the action"""
+        if hand_off and self.system_action is not None:
+            self.hand_off(target, self.system_action)
+            return
+        self.cancel_hand_off()
+        seconds = target.timestamp() - time.time()
+        if seconds > 0:
+            self.on = True
+            self.stop_vibration()
+            self.stop_background_sound()
+            self.start_countdown(seconds)
+
+    def hand_off(self, target, action, scheduler=None):
+        """
+        Schedule action for target with the system scheduler and count down to it.
+
+        The window can then be closed; a later start shows the same
+        countdown again. The scheduler runs on the job keeper's thread and
+        the countdown starts in on_schedule_changed; failures are reported
+        there and leave the countdown as it was. scheduler defaults to the
+        one given to the window, else the best available.
+        """
+        self.job_keeper.hand_off(scheduler or self.scheduler or default_scheduler(), target, action)
+
+    def cancel_hand_off(self):
+        """Remove the job handed to the system scheduler, if any"""
+        if self.scheduled is None:
+            return
+        self.scheduled = None
+        self.job_keeper.cancel()
+
+    def on_schedule_changed(self, job, error):
+        """Follow the job keeper: count down to a new or moved job, or report why it failed"""
+        if error is not None:
+            print(f"Error: {error}")
+            QMessageBox.warning(self, "Scheduling Failed", error)
+            return
+        if job is None or job is self.scheduled:
+            self.scheduled = job
+            return
+        self.scheduled = job
+        self.on = True
+        self.stop_vibration()
+        self.stop_background_sound()
+        self.start_countdown(job.remaining())
 
     def configure_countdown_time(self):
         """
@@ -291,6 +1000,18 @@ class ShutdownTimerApp(QMainWindow):
             margin-bottom: 10px;
         """)
         layout.addWidget(hint_label)
+
+        # Wall-clock target, optionally run by the system scheduler
+        at_layout = QHBoxLayout()
+        at_label = QLabel("Or count down to (HH:MM):")
+        at_input = QLineEdit()
+        at_input.setPlaceholderText("02:00")
+        at_layout.addWidget(at_label)
+        at_layout.addWidget(at_input)
+        layout.addLayout(at_layout)
+        hand_off_box = QCheckBox("Let the system run the action (the clock can be closed)")
+        hand_off_box.setChecked(self.scheduled is not None)
+        layout.addWidget(hand_off_box)
         
         # Button layout
         button_layout = QHBoxLayout()
@@ -310,6 +1031,9 @@ class ShutdownTimerApp(QMainWindow):
         
         # Show dialog and process result
         if dialog.exec_() == QDialog.Accepted:
+            if at_input.text().strip():
+                return self.confirm_target_time(at_input.text(), action_dropdown.currentText().lower(),
+                                                hand_off_box.isChecked())
             try:
                 # Parse input
                 input_text = time_input.text()
@@ -337,28 +1061,16 @@ class ShutdownTimerApp(QMainWindow):
                     )
                     confirm.setIcon(QMessageBox.Question)
                     confirm.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                    config_file = os.path.join(os.path.expanduser("~"), "shutdown_timer_config.json")
                     if confirm.exec_() == QMessageBox.Yes:
-                        if not os.path.isfile(config_file):
-                            with open(config_file, "w") as file:
-                                json.dump({
-                                    "total increase in timer": total_seconds,
-                                    "system action": system_action
-                                }, file, indent=4)
-                        else:
-                                                # Update the existing config.json file
-                            with open(config_file, "r") as file:
-                                data = json.load(file)  # Load current data into a dictionary
-
-                            # Update the data with new values
-                            data.update({
-                                "total increase in timer": total_seconds,
-                                "system action": system_action
-                            })
-
-                            # Write updated data back to the file
-                            with open(config_file, "w") as file:
-                                json.dump(data, file, indent=4)
+                        self.config_store.update(timer_increase=total_seconds, system_action=system_action)
+                        resolved = self.configure_action()
+                        if not resolved.ok:
+                            QMessageBox.warning(
+                                self,
+                                "System Action Unavailable",
+                                f"The timer will run, but {system_action} will probably fail:\n"
+                                + "\n".join(f"• {problem}" for problem in resolved.problems)
+                            )
                         return total_seconds, system_action
                 else:
                     QMessageBox.warning(
@@ -378,155 +1090,394 @@ class ShutdownTimerApp(QMainWindow):
                     "Example: 01:30:45"
                 )
         
-        return CONFIGURATION, self.system_action
+        return self.config_store.config.timer_increase, self.system_action
     
+    def confirm_target_time(self, text, system_action, hand_off):
+        """
+        Confirm and start a countdown to a wall-clock time entered in the dialog.
+
+        Returns:
+            tuple: (timer increase, system action) as configure_countdown_time does
+        """
+        if system_action == "nothing":
+            system_action = None
+        try:
+            target = parse_target(text)
+        except ValueError:
+            QMessageBox.warning(self, "Incorrect Format", "Please use 'HH:MM' format\nExample: 02:00")
+            return self.config_store.config.timer_increase, self.system_action
+        confirm = QMessageBox.question(
+            self, "Confirm Action",
+            f"System will {system_action} at {target:%Y-%m-%d %H:%M:%S}"
+            + ("\nThe system scheduler will run it, so the clock can be closed." if hand_off and system_action else ""),
+            QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            self.config_store.update(system_action=system_action)
+            self.configure_action()
+            self.start_at(target, hand_off)
+        return self.config_store.config.timer_increase, self.system_action
+
     def start_countdown(self, total_seconds):
         """Start the countdown timer"""
         self.start_background_sound('ticking-clock-sound.mp3', loop=True)
+        if self.sequence_cues:
+            self.audio.prepare_sequence(self.sequence_cues, self.sequence_seconds)
         self.total_countdown_seconds = total_seconds
-        self.countdown_time = QTime(0, total_seconds // 60, total_seconds % 60)
-        self.timer.start(1000)  # Update every second
+        self.countdown.start(total_seconds)
+        # Wall-clock targets give fractional seconds; the display shows whole ones
+        self.remaining_seconds = self.display_seconds = math.ceil(total_seconds)
+        self.restore_cues(self.timeline.rewind(total_seconds))
+        self.schedule_tick()
+        if self.frame_scheduler is not None and not self.idle:
+            self.frame_scheduler.start()
+        self.update()
+
+    def schedule_tick(self):
+        """Arm the timer for the moment the remaining whole second changes, or the next cue while idle"""
+        if self.idle:
+            wait = self.seconds_until_next_cue()
+        else:
+            wait = self.countdown.seconds_until_next_tick()
+        self.timer.start(int(wait * 1000) + 1)
+
+    def seconds_until_next_cue(self):
+        """Time until the next cue fires or the countdown ends"""
+        remaining = self.countdown.remaining()
+        target = self.timeline.next_offset() or 0
+        return min(max(0.0, remaining - target), self.IDLE_MAX_SLEEP)
 
-    def start_background_sound(self, sound_path, start_time=0, loop=False):
-        """Play background sound asynchronously"""
-        worker = SoundWorker(resource_path(os.path.join('sounds', sound_path)), start_time, loop)
-        self.threadpool.start(worker)
+    def start_background_sound(self, sound_name, start_time=0, loop=False):
+        """Queue a cached background sound on the audio thread"""
+        self.audio.play(sound_name, loop=loop, start_time=start_time)
+
+    def fire_cue(self, cue):
+        """Play a cue's sound and switch its vibration"""
+        if cue.vibrate and not self.vibrating:
+            self.start_vibration()
+        elif cue.vibrate is False:
+            self.stop_vibration()
+        if cue.sound == AudioThread.SEQUENCE:
+            # Seek into the mix so it stays in step with the remaining time
+            offset = max(0.0, self.sequence_seconds - self.countdown.remaining())
+            self.audio.play_sequence(self.sequence_cues, self.sequence_seconds, offset)
+        elif cue.sound is not None:
+            self.start_background_sound(cue.sound, loop=cue.loop)
+
+    def restore_cues(self, past):
+        """Bring back the loops and vibration of cues the countdown is already past"""
+        for cue in past:
+            if cue.loop or cue.sound == AudioThread.SEQUENCE:
+                self.fire_cue(cue)
+            elif cue.vibrate is not None:
+                self.fire_cue(Cue(cue.offset, vibrate=cue.vibrate))
+
+    def start_vibration(self):
+        """Start the vibration effect"""
+        if self.shake_mode == "window":
+            self.original_position = self.pos()
+        self.vibrating = True
+        if not self.idle:
+            self.vibration_timer.start(100)
 
     def stop_vibration(self):
         """Stop the vibration effect"""
+        self.vibrating = False
         self.vibration_timer.stop()
-        self.move(self.original_position)
+        if self.original_position is not None:
+            self.move(self.original_position)
+            self.original_position = None
+        if not self.shake_offset.isNull():
+            self.shake_offset = QPoint()
+            self.update()
 
     def stop_background_sound(self):
         """Stop all background music and sounds"""
-        pygame.mixer.music.stop()
-        pygame.mixer.stop()
+        self.audio.stop()
     
     def update_clock(self):
         """Update clock state and countdown"""
-        self.countdown_time = self.countdown_time.addSecs(-1)
-        global COUNTDOWN
-        COUNTDOWN -= 1
+        if not self.countdown.running:
+            return
+        self.wakeups.wake()
+        tick_start = time.perf_counter()
+        previous, self.remaining_seconds = self.countdown.tick()
+        if self.tracer.enabled:
+            # The tick was due the moment the remaining time reached this whole second
+            ideal = self.countdown.deadline - self.remaining_seconds
+            late_ms = round((self.countdown.clock() - ideal) * 1000, 3)
 
-        if self.countdown_time > QTime(0, 0, 25) and not self.not_countdown:
-            self.not_countdown = True
-            self.stop_background_sound()
-            self.stop_vibration()
+        # Every cue reached since the previous tick, so a late tick cannot skip one
+        for cue in self.timeline.advance(self.remaining_seconds):
+            self.fire_cue(cue)
         
-        elif self.countdown_time <= QTime(0, 0, 23) and self.not_countdown:
-            self.vibration_timer.start(100)
-            self.not_countdown = False
-            # start_time = 24 - self.countdown_time.second()
-            self.start_background_sound('countdown.mp3', start_time=0)
-            
-            if self.not_alarm:
-                self.start_background_sound('alarm.mp3', loop=True)
-                self.not_alarm = False
-        
-        if self.countdown_time == QTime(0, 0, 3):
-            self.start_background_sound('bomb-beeps.mp3')
-            self.start_background_sound('explode.mp3')
-        
-        if self.countdown_time == QTime(0, 0, 0):
-            self.vibration_timer.stop()
-            self.timer.stop()
+        if self.remaining_seconds == 0:
+            self.stop_vibration()
+            self.countdown.stop()
             self.stop_background_sound()
-            # Uncomment to actually shutdown system
-            shutdown_system(action=self.system_action)
+            if self.frame_scheduler is not None:
+                self.frame_scheduler.stop()
+            if self.scheduled is not None:
+                # The system scheduler runs the action at this moment
+                self.scheduled = None
+                self.job_keeper.finished()
+            else:
+                # Runs on a worker thread; hook progress and the result arrive through signals
+                if self.action_executor.hooks:
+                    self.set_hook_status(f"Hooks 0/{len(self.action_executor.hooks)}")
+                self.action_executor.execute(self.signals.action_finished.emit, self.signals.hook_progress.emit)
+        else:
+            self.schedule_tick()
         
-        self.update()
+        if (self.frame_scheduler is None or self.remaining_seconds == 0) and not self.idle:
+            self.show_remaining(self.remaining_seconds)
+        if self.tracer.enabled:
+            self.tracer.complete("tick", "timer", tick_start, remaining=self.remaining_seconds,
+                                 late_ms=late_ms, skipped=max(0, previous - self.remaining_seconds - 1))
+
+    def show_remaining(self, seconds):
+        """Display seconds remaining, repainting only what changes"""
+        shown = self.display_seconds
+        self.display_seconds = seconds
+        if not self.isVisible():
+            # Qt drops updates to a hidden window and the next show paints everything
+            return
+        if not self.shake_offset.isNull():
+            # The whole drawing is displaced while shaking
+            self.update()
+        else:
+            self.update(self.dirty_region(shown, seconds))
+
+    def animate_frame(self):
+        """Advance the smooth display and book the next frame that changes anything"""
+        if not self.countdown.running or self.idle:
+            return
+        self.wakeups.wake()
+        remaining = self.countdown.remaining()
+        self.show_remaining(remaining)
+        self.frame_scheduler.start(self.seconds_until_visual_change(remaining))
+
+    def seconds_until_visual_change(self, seconds):
+        """How long the display stays unchanged from seconds remaining"""
+        waits = [
+            seconds_until_step(seconds, 3600, self.minute_hand_sprites.steps),
+            seconds_until_step(seconds, 60, self.second_hand_sprites.steps),
+        ]
+        if self.total_countdown_seconds:
+            # The red edge moves by a pixel every pixel_time seconds
+            pixel_time = self.total_countdown_seconds / self.height()
+            top = self.red_region_top(seconds)
+            exact = self.red_region_top_exact(seconds)
+            waits.append((exact - (top - 0.5)) * pixel_time)
+        return max(0.0, min(waits))
+
+    def clock_center(self):
+        return self.width() // 2, (self.height() // 2) - 8
+
+    def hand_layout(self, seconds):
+        """(sprite cache, pivot x, pivot y, angle) for each hand at seconds remaining"""
+        center_x, center_y = self.clock_center()
+        return (
+            (self.minute_hand_sprites,
+             center_x,
+             center_y - 15 + self.minute_hand_image.height() // 2,
+             quantize_angle(seconds, 3600, self.minute_hand_sprites.steps)),
+            (self.second_hand_sprites,
+             center_x,
+             center_y - 22 + self.second_hand_image.height() // 2 - 22,
+             quantize_angle(seconds, 60, self.second_hand_sprites.steps)),
+        )
+
+    def red_region_top_exact(self, seconds):
+        remaining_fraction = seconds / self.total_countdown_seconds
+        _, center_y = self.clock_center()
+        height = self.height()
+        return center_y + height / 2 - height * (1 - remaining_fraction)
+
+    def red_region_top(self, seconds):
+        """Top edge of the rising red region, or None when there is none"""
+        if self.total_countdown_seconds == 0:
+            return None
+        return round(self.red_region_top_exact(seconds))
+
+    def display_state(self, seconds):
+        """Everything that is drawn differently depending on seconds remaining"""
+        angles = tuple(layout[3] for layout in self.hand_layout(seconds))
+        return angles, self.red_region_top(seconds)
+
+    def dirty_region(self, old_seconds, new_seconds):
+        """Region that changes between two displayed remaining times"""
+        region = QRegion()
+        if self.display_state(old_seconds) == self.display_state(new_seconds):
+            return region
+        for seconds in (old_seconds, new_seconds):
+            for sprites, pivot_x, pivot_y, angle in self.hand_layout(seconds):
+                region += sprites.bounds(angle).translated(pivot_x, pivot_y).adjusted(-1, -1, 1, 1)
+        old_top = self.red_region_top(old_seconds)
+        new_top = self.red_region_top(new_seconds)
+        if old_top is not None:
+            top = min(old_top, new_top)
+            region += QRect(0, top, self.width(), max(old_top, new_top) - top)
+        region &= self.rect()
+        if self.debug_dirty:
+            # Repaint last frame's outlines too so they do not linger
+            stale = self.debug_outlined
+            self.debug_outlined = region
+            region = region + stale + self.debug_label_rect
+        return region
 
     def paintEvent(self, event):
-        """Redraw the clock and red button"""
+        """Redraw the layers that intersect the dirty region"""
+        start = time.perf_counter()
         painter = QPainter(self)
-        painter.drawPixmap(0, 0, self.clock_shape)
-        
-        # Draw red button in top-left corner
-        painter.drawPixmap(self.red_btn_pos_x, 0, self.red_button)
+        dirty_rects = event.region().rects()
+        if not self.shake_offset.isNull():
+            # Shake inside the painter instead of moving the native window
+            painter.translate(self.shake_offset)
+            dirty_rects = [rect.translated(-self.shake_offset) for rect in dirty_rects]
+        for rect in dirty_rects:
+            painter.drawPixmap(rect, self.static_layer, rect)
         
         self.draw_dynamic_clock(painter)
         self.draw_rising_red_region(painter)
 
+        self.painted_pixels = sum(rect.width() * rect.height() for rect in dirty_rects)
+        if self.hook_status:
+            self.draw_hook_status(painter)
+        if self.debug_dirty:
+            self.draw_debug_overlay(painter, self.debug_outlined.rects())
+        painter.end()
+        if self.tracer.enabled:
+            self.tracer.complete("paint", "render", start, rects=len(dirty_rects),
+                                 pixels=self.painted_pixels, seconds=self.display_seconds)
+        if self.frame_scheduler is not None:
+            self.frame_scheduler.paint_finished(time.perf_counter() - start)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            self.profiler.record("first paint", time.perf_counter() - self.profiler.shown_at)
+            # Audio is not needed before the first click, so open it once the window is up
+            QTimer.singleShot(0, self.start_audio)
+            self.profiler.report("first paint", "mixer init")
+
     def draw_dynamic_clock(self, painter):
-        """Draw and rotate clock hands"""
-        center_x = (self.width() // 2)
-        center_y = (self.height() // 2) - 8
-
-        seconds = self.countdown_time.minute() * 60 + self.countdown_time.second()
-        minute_angle = (360 * seconds) / 3600
-        second_angle = (360 * (seconds % 60)) / 60
-
-        # Draw minute hand
-        painter.save()
-        painter.translate(center_x, center_y - 15)
-        painter.translate(0, self.minute_hand_image.height() // 2)
-        painter.rotate(minute_angle)
-        painter.drawPixmap(
-            -self.minute_hand_image.width() // 2, 
-            -self.minute_hand_image.height(), 
-            self.minute_hand_image
-        )
-        painter.restore()
-
-        # Draw second hand
-        painter.save()
-        painter.translate(center_x, center_y - 22)
-        painter.translate(0, self.second_hand_image.height() // 2 - 22)
-        painter.rotate(second_angle)
-        painter.drawPixmap(
-            -self.second_hand_image.width() // 2, 
-            -self.second_hand_image.height(), 
-            self.second_hand_image
-        )
-        painter.restore()      
+        """Draw the clock hands from their pre-rotated sprites"""
+        for sprites, pivot_x, pivot_y, angle in self.hand_layout(self.display_seconds):
+            sprites.draw(painter, pivot_x, pivot_y, angle)
+
+    def sprite_cache_bytes(self):
+        """Memory held by the pre-rotated hand sprites"""
+        return self.minute_hand_sprites.memory_bytes + self.second_hand_sprites.memory_bytes
+
+    def stats(self):
+        """Wakeups, frame pacing, image, sprite and sound caches, as --stats prints them"""
+        stats = {
+            "wakeups": self.wakeups.stats(),
+            "images": self.image_cache.stats(),
+            "sprite_cache_bytes": self.sprite_cache_bytes(),
+            "audio": dict(self.audio.sound_bank.stats(), total_resident_bytes=self.audio.resident_bytes(),
+                          latency=self.audio.latency_stats()),
+        }
+        if self.frame_scheduler is not None:
+            stats["frames"] = self.frame_scheduler.stats()
+        return stats
         
     def draw_rising_red_region(self, painter):
         """Draw a rising red region as countdown approaches zero"""
-        if self.total_countdown_seconds == 0:
+        top = self.red_region_top(self.display_seconds)
+        if top is None:
             return
+        _, center_y = self.clock_center()
+        bottom = center_y + self.height() // 2
+        painter.fillRect(QRect(0, top, self.width(), bottom - top), QColor(198, 40, 40, 255))
 
-        # Calculate remaining time fraction
-        remaining_fraction = (self.countdown_time.minute() * 60 + self.countdown_time.second()) / self.total_countdown_seconds
-        
-        # Center of the clock
-        center_x = (self.width() // 2)
-        center_y = (self.height() // 2) - 8
-
-        # Dimensions for the rising region
-        width = self.width()   # 60% of clock width
-        height = self.height()   # 50% of clock height
-
-        # Calculate current height of the red region
-        current_height = height * (1 - remaining_fraction)
-
-        # Create a path for the rising region
-        path = QPainterPath()
-        path.addRect(
-            center_x - width/2, 
-            center_y + height/2 - current_height, 
-            width, 
-            current_height
-        )
-
-        # Set up semi-transparent red color
-        painter.setBrush(QColor(198, 40, 40, 255))  # Slightly transparent red
-        painter.setPen(Qt.NoPen)
+    def draw_hook_status(self, painter):
+        """Show the progress of the pre-action hooks while the action waits for them"""
+        painter.fillRect(self.hook_label_rect, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.white)
+        painter.drawText(self.hook_label_rect, Qt.AlignCenter, self.hook_status)
 
-        # Draw the rising red region
-        painter.drawPath(path)
+    def draw_debug_overlay(self, painter, dirty_rects):
+        """Outline the latest dirty rectangles and report the pixels painted this frame"""
+        painter.setPen(QPen(QColor(0, 200, 0), 1))
+        painter.setBrush(Qt.NoBrush)
+        for rect in dirty_rects:
+            painter.drawRect(rect.adjusted(0, 0, -1, -1))
+        painter.fillRect(self.debug_label_rect, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.white)
+        painter.drawText(self.debug_label_rect, Qt.AlignCenter, f"{self.painted_pixels} px")
         
     def vibrate(self):
         """Simulate vibration effect"""
+        self.wakeups.wake()
         offset = self.vibration_offset[self.vibration_index]
-        self.move(self.original_position + offset)
+        if self.tracer.enabled:
+            self.tracer.instant("vibrate", "effects", mode=self.shake_mode, step=self.vibration_index)
+        if self.shake_mode == "window":
+            self.move(self.original_position + offset)
+        else:
+            self.shake_offset = offset
+            self.update()
         self.vibration_index = (self.vibration_index + 1) % len(self.vibration_offset)
 
 def main():
     """Main function to start the app"""
-    app = QApplication(sys.argv)
-    shutdown_timer = ShutdownTimerApp(scale_factor=0.15)
+    parser = argparse.ArgumentParser(description="Shutaap shutdown timer")
+    parser.add_argument("--debug-dirty", action="store_true",
+                        help="outline the repainted regions and show pixels painted per frame")
+    parser.add_argument("--smooth", action="store_true",
+                        help="animate the hands and red region continuously")
+    parser.add_argument("--shake", choices=("paint", "window"), default="paint",
+                        help="shake the drawing (default) or move the whole window")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase takes")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the system action instead of running it")
+    parser.add_argument("--stats", action="store_true",
+                        help="print timer wakeups per minute while visible and while hidden, "
+                             "frame pacing and cache statistics on exit")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record ticks, paints, sounds and vibration and write them to FILE "
+                             "as Chrome trace-event JSON on exit")
+    parser.add_argument("--scheduler", choices=sorted(SCHEDULERS),
+                        help="system scheduler --hand-off uses (default: systemd if running, else at)")
+    add_launch_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+
+    profiler = StartupProfiler(_IMPORT_START, enabled=args.profile_startup)
+    tracer = Tracer() if args.trace else NULL_TRACER
+    profiler.record("imports", time.perf_counter() - _IMPORT_START)
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
+    server = None
+    if not args.new_instance:
+        # Claim the name before building the window
+        server = InstanceServer()
+        if not server.listen():
+            # Another clock started since this launch looked for one
+            status = handoff(sys.argv[1:])
+            if status is not None:
+                sys.exit(status)
+            server = None
+    shutdown_timer = ShutdownTimerApp(scale_factor=0.15, debug_dirty=args.debug_dirty,
+                                      smooth=args.smooth, shake_mode=args.shake,
+                                      profiler=profiler,
+                                      action_backend=DryRunBackend() if args.dry_run else None,
+                                      tracer=tracer,
+                                      scheduler=scheduler_for(args.scheduler) if args.scheduler else None)
+    profiler.mark_shown()
     shutdown_timer.show()
-    sys.exit(app.exec_())
+    request = launch_request(args)
+    if "add" in request or "action" in request or "at" in request:
+        shutdown_timer.handle_launch(request)
+    if server is not None:
+        server.attach(shutdown_timer)
+    status = app.exec_()
+    if server is not None:
+        server.server.close()
+    if tracer.enabled:
+        tracer.dump(args.trace)
+    if args.stats:
+        print(json.dumps(shutdown_timer.stats(), indent=4))
+    sys.exit(status)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,452 @@
+"""
+Fast-forward simulation of the Shutaap countdown.
+
+ShutdownTimerApp takes its clock, timers, audio and action executor from
+the caller. Here they are replaced by a virtual clock that jumps straight
+to the next due timer, a recorder in place of the audio thread and an
+executor that runs the action inline. A 24 hour countdown plays out in
+about a second (milliseconds with --hidden), and every run yields the
+same event log of cues, sounds, vibration, repaints and the final action:
+
+    python simulate.py 01:00:00 --add 25:10 --output run.json
+    python simulate.py --matrix --output golden.json
+    python simulate.py --matrix --baseline golden.json
+
+--matrix runs the built-in scenarios: time added just before, at and
+just after every cue threshold, a 24 hour countdown shown and hidden,
+and several cue configurations. The exit status is 1 if a scenario
+breaks an invariant (see check) or its log differs from the baseline.
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtWidgets import QApplication
+
+import shutaap
+from actions import ActionExecutor, DryRunBackend
+from config import Config, ConfigStore
+from countdown import Cue, parse_hms
+
+
+class VirtualClock:
+    """
+    Time that only moves when the simulation says so.
+
+    Timers created by timer() are kept in a heap by due time; run() jumps
+    the clock from one to the next, firing each as it comes due.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self._heap = []
+        self._sequence = 0
+
+    def __call__(self):
+        return self.now
+
+    def timer(self, parent=None):
+        """A QTimer stand-in driven by this clock, usable as a timer_factory"""
+        return VirtualTimer(self, parent)
+
+    def schedule(self, timer, due, generation):
+        # The sequence number keeps timers due at the same moment in start order
+        self._sequence += 1
+        heapq.heappush(self._heap, (due, self._sequence, generation, timer))
+
+    def next_due(self):
+        """Due time of the earliest armed timer, or None when none is armed"""
+        while self._heap:
+            due, _, generation, timer = self._heap[0]
+            if timer.generation == generation:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def run(self, until=None, max_events=10000000):
+        """
+        Fire timers in order until none is armed or the next is due after until.
+
+        Returns:
+            int: number of timers fired.
+        """
+        fired = 0
+        while fired < max_events:
+            due = self.next_due()
+            if due is None or (until is not None and due > until):
+                break
+            _, _, _, timer = heapq.heappop(self._heap)
+            self.now = max(self.now, due)
+            timer.fire()
+            fired += 1
+        if until is not None:
+            self.now = max(self.now, until)
+        return fired
+
+
+class VirtualTimer(QObject):
+    """The part of QTimer the window uses, running on a VirtualClock"""
+    timeout = pyqtSignal()
+
+    def __init__(self, clock, parent=None):
+        super().__init__(parent)
+        self.clock = clock
+        self.single_shot = False
+        self.msec = 0
+        self.generation = 0
+        self.active = False
+
+    def setSingleShot(self, single_shot):
+        self.single_shot = single_shot
+
+    def setTimerType(self, timer_type):
+        pass
+
+    def isActive(self):
+        return self.active
+
+    def interval(self):
+        return self.msec
+
+    def start(self, msec=None):
+        if msec is not None:
+            self.msec = msec
+        self.generation += 1
+        self.active = True
+        self.clock.schedule(self, self.clock.now + self.msec / 1000, self.generation)
+
+    def stop(self):
+        # Entries of older generations are dropped when they reach the top of the heap
+        self.generation += 1
+        self.active = False
+
+    def fire(self):
+        if self.single_shot:
+            self.active = False
+        else:
+            # A zero interval would never let the clock move on
+            self.generation += 1
+            self.clock.schedule(self, self.clock.now + max(self.msec, 1) / 1000, self.generation)
+        self.timeout.emit()
+
+
+class EventLog:
+    """
+    What happened and when, in virtual seconds since the start.
+
+    Consecutive repaints and shake frames are folded into one entry with a
+    frame count, which keeps the log of a day-long countdown small enough
+    to keep as a baseline.
+    """
+    FOLDED = ("repaint", "shake")
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.events = []
+        self.window = None
+
+    def record(self, event, **details):
+        remaining = self.window.remaining_seconds if self.window is not None else 0
+        at = round(self.clock.now, 3)
+        last = self.events[-1] if self.events else None
+        if event in self.FOLDED and last is not None and last["event"] == event:
+            last["frames"] += 1
+            last["until"] = at
+            last["last"] = details.get("seconds", remaining)
+            return
+        entry = {"t": at, "remaining": remaining, "event": event}
+        entry.update(details)
+        if event in self.FOLDED:
+            entry.update(frames=1, until=at, last=details.get("seconds", remaining))
+        self.events.append(entry)
+
+    def of(self, *kinds):
+        return [event for event in self.events if event["event"] in kinds]
+
+
+class RecordingAudio:
+    """Stands in for AudioThread and logs every command instead of playing it"""
+    def __init__(self, log):
+        self.log = log
+        self.timings = {}
+
+    def start(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+    def play(self, name, loop=False, start_time=0):
+        self.log.record("play", sound=name, loop=loop)
+
+    def stop(self, name=None):
+        self.log.record("stop", sound=name)
+
+    def fade(self, fade_ms, name=None):
+        self.log.record("fade", sound=name, fade_ms=fade_ms)
+
+    def prepare_sequence(self, cues, length):
+        pass
+
+    def play_sequence(self, cues, length, offset=0):
+        self.log.record("play", sound=shutaap.AudioThread.SEQUENCE, offset=round(offset, 3))
+
+
+class InlineActionExecutor(ActionExecutor):
+    """Runs the action on the calling thread, so the log order never depends on scheduling"""
+    def __init__(self, log):
+        super().__init__(DryRunBackend(echo=False))
+        self.log = log
+
+    def execute(self, on_done=None, on_progress=None):
+        self.log.record("action", action=self.resolved.action)
+        self._run(self.resolved, list(self.hooks), on_done, on_progress)
+
+
+class SimulatedTimerApp(shutaap.ShutdownTimerApp):
+    """The real window, logging cues, vibration and repaints as they happen"""
+    def __init__(self, log, **kwargs):
+        self.log = log
+        self.restoring = False
+        super().__init__(**kwargs)
+        log.window = self
+
+    def fire_cue(self, cue):
+        self.log.record("restore" if self.restoring else "cue", offset=cue.offset, sound=cue.sound,
+                        vibrate=cue.vibrate)
+        super().fire_cue(cue)
+
+    def restore_cues(self, past):
+        self.restoring = True
+        try:
+            super().restore_cues(past)
+        finally:
+            self.restoring = False
+
+    def start_vibration(self):
+        if not self.vibrating:
+            self.log.record("vibration", on=True)
+        super().start_vibration()
+
+    def stop_vibration(self):
+        if self.vibrating:
+            self.log.record("vibration", on=False)
+        super().stop_vibration()
+
+    def vibrate(self):
+        self.log.record("shake")
+        super().vibrate()
+
+    def show_remaining(self, seconds):
+        self.log.record("repaint", seconds=seconds)
+        super().show_remaining(seconds)
+
+    def on_action_finished(self, result):
+        self.log.record("action finished", action=result.action, ok=result.ok)
+
+
+class Scenario:
+    """
+    A countdown of seconds, with extra time added at given remaining times.
+
+    adds is a list of (remaining, extra) pairs: when the countdown reaches
+    remaining seconds, extra seconds are added, as a click on the red
+    button would.
+    """
+    def __init__(self, name, seconds, adds=(), hidden=False, cues=None, premix=False,
+                 system_action="shutdown"):
+        self.name = name
+        self.seconds = seconds
+        self.adds = sorted(adds, key=lambda add: -add[0])
+        self.hidden = hidden
+        self.cues = cues
+        self.premix = premix
+        self.system_action = system_action
+
+    def duration(self):
+        """Virtual seconds from the start to the action"""
+        return self.seconds + sum(extra for _, extra in self.adds)
+
+
+def simulate(scenario, directory, scale_factor=0.15):
+    """
+    Run a scenario to the end on a virtual clock.
+
+    The config file and the image and mask caches live in directory, which
+    must outlast the window, so the user's own are never read or written.
+
+    Returns:
+        tuple: (EventLog, window) after every timer has stopped.
+    """
+    clock = VirtualClock()
+    log = EventLog(clock)
+    config_store = ConfigStore(os.path.join(directory, "config.json"))
+    config_store.config = Config(system_action=scenario.system_action, cues=scenario.cues)
+    window = SimulatedTimerApp(log, scale_factor=scale_factor, clock=clock, timer_factory=clock.timer,
+                               audio=RecordingAudio(log), config_store=config_store,
+                               action_executor=InlineActionExecutor(log), cache_dir=os.path.join(directory, "cache"))
+    window.premix = scenario.premix
+    window.configure_cues()
+    if scenario.hidden:
+        window.set_idle(True)
+    log.record("start", seconds=scenario.seconds, total=scenario.seconds)
+    window.add_time(scenario.seconds)
+    for remaining, extra in scenario.adds:
+        clock.run(until=window.countdown.deadline - remaining)
+        log.record("add", seconds=extra, total=window.countdown.remaining_seconds() + extra)
+        window.add_time(extra)
+    clock.run()
+    return log, window
+
+
+def check(scenario, log, window):
+    """
+    The invariants every run must keep.
+
+    Returns:
+        list: descriptions of the invariants that were broken.
+    """
+    problems = []
+    actions = log.of("action")
+    if len(actions) != 1:
+        problems.append(f"action ran {len(actions)} times")
+    elif abs(actions[0]["t"] - scenario.duration()) > 0.002:
+        problems.append(f"action ran at {actions[0]['t']}s instead of {scenario.duration()}s")
+    if actions:
+        after = log.events[log.events.index(actions[0]) + 1:]
+        late = [event for event in after if event["event"] in ("cue", "play", "shake")
+                or event["event"] == "vibration" and event["on"]]
+        if late:
+            problems.append(f"{late[0]['event']} after the action")
+    if window.vibrating or window.countdown.running:
+        problems.append("still vibrating or counting down at the end")
+
+    # After the last time change every cue below the new remaining time fires, in order, on time
+    starts = log.of("start", "add")
+    last = starts[-1]
+    since = log.events[log.events.index(last) + 1:]
+    expected = [cue.offset for cue in window.timeline.cues if cue.offset < last["total"]]
+    fired = [event for event in since if event["event"] == "cue"]
+    if [event["offset"] for event in fired] != expected:
+        problems.append(f"cues fired at {[event['offset'] for event in fired]}, expected {expected}")
+    early = [event for event in fired if event["remaining"] != event["offset"]]
+    if early:
+        problems.append(f"cue {early[0]['offset']} fired with {early[0]['remaining']}s remaining")
+
+    repaints = log.of("repaint")
+    if not scenario.hidden and (not repaints or repaints[-1]["last"] != 0):
+        problems.append("the final repaint does not show zero")
+    return problems
+
+
+def matrix():
+    """The built-in scenarios"""
+    default_cues = Config().cues
+    scenarios = [
+        Scenario("day, shown", 24 * 3600),
+        Scenario("day, hidden", 24 * 3600, hidden=True),
+        Scenario("day, premixed", 24 * 3600, premix=True),
+        Scenario("no cues", 120, cues=[]),
+        Scenario("short countdown", 2),
+        Scenario("vibration off early", 60, cues=default_cues + [Cue(10, vibrate=False), Cue(5, "alarm.mp3")]),
+        Scenario("early sound, premixed", 120, cues=default_cues + [Cue(90, "alarm.mp3")], premix=True),
+        Scenario("sleep action", 30, system_action="sleep"),
+        Scenario("nothing action", 30, system_action=None),
+    ]
+    for offset in sorted({cue.offset for cue in default_cues}, reverse=True):
+        for remaining in (offset + 1, offset, offset - 1):
+            if remaining < 1:
+                continue
+            for hidden in (False, True):
+                for premix in (False, True):
+                    name = f"add 10s at {remaining}s{', hidden' if hidden else ''}{', premixed' if premix else ''}"
+                    scenarios.append(Scenario(name, 60, adds=[(remaining, 10)], hidden=hidden, premix=premix))
+    scenarios.append(Scenario("add twice", 60, adds=[(23, 30), (2, 5)]))
+    return scenarios
+
+
+def compare(logs, baseline):
+    """Return (scenario, first differing index) for logs that differ from the baseline"""
+    differences = []
+    for name, events in logs.items():
+        previous = baseline.get(name)
+        if previous is None or previous == events:
+            continue
+        index = next((i for i, (a, b) in enumerate(zip(previous, events)) if a != b),
+                     min(len(previous), len(events)))
+        differences.append((name, index, previous[index:index + 1], events[index:index + 1]))
+    return differences
+
+
+def parse_add(text):
+    """'REMAINING:EXTRA' in whole seconds, e.g. '25:10' adds 10 seconds when 25 remain"""
+    remaining, _, extra = text.partition(":")
+    try:
+        return int(remaining), int(extra)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected REMAINING:EXTRA in seconds: {text!r}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fast-forward Shutaap countdowns on a virtual clock")
+    parser.add_argument("duration", nargs="?", help="countdown to simulate, HH:MM:SS")
+    parser.add_argument("--add", type=parse_add, action="append", default=[], metavar="REMAINING:EXTRA",
+                        help="add EXTRA seconds when REMAINING seconds are left (repeatable)")
+    parser.add_argument("--hidden", action="store_true", help="simulate the window hidden")
+    parser.add_argument("--premix", action="store_true", help="play the end sequence premixed")
+    parser.add_argument("--matrix", action="store_true", help="run the built-in scenarios")
+    parser.add_argument("--output", help="write the event logs to this JSON file")
+    parser.add_argument("--baseline", help="event logs of an earlier run to compare against")
+    args = parser.parse_args(argv)
+    if args.matrix == bool(args.duration):
+        parser.error("give a duration or --matrix")
+
+    if args.matrix:
+        scenarios = matrix()
+    else:
+        scenarios = [Scenario(args.duration, parse_hms(args.duration), args.add, args.hidden, premix=args.premix)]
+
+    cwd = os.getcwd()
+    # Assets are resolved relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    logs = {}
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="shutaap-simulate-") as directory:
+        for scenario in scenarios:
+            start = time.perf_counter()
+            log, window = simulate(scenario, directory)
+            elapsed = time.perf_counter() - start
+            problems = check(scenario, log, window)
+            window.close()
+            window.deleteLater()
+            logs[scenario.name] = log.events
+            status = "ok" if not problems else "FAILED"
+            print(f"{scenario.name}: {status}, {scenario.duration()}s simulated in {elapsed * 1000:.1f} ms, "
+                  f"{len(log.events)} events")
+            for problem in problems:
+                print(f"  {problem}")
+            failed = failed or bool(problems)
+        app.processEvents()
+
+    differences = []
+    if args.baseline:
+        with open(os.path.join(cwd, args.baseline)) as file:
+            differences = compare(logs, json.load(file))
+    if args.output:
+        with open(os.path.join(cwd, args.output), "w") as file:
+            json.dump(logs, file, indent=1)
+            file.write("\n")
+    for name, index, before, after in differences:
+        print(f"Changed: {name} event {index}: {before} -> {after}")
+    return 1 if failed or differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Background process that runs any number of named Shutaap timers.
+
+Timers live in a heap ordered by their next event (a sound cue or the
+deadline), so the daemon sleeps until the earliest one no matter how many
+timers exist. It is controlled over a local Unix socket with one JSON
+request per connection:
+
+    python timer_daemon.py serve
+    python timer_daemon.py add pomodoro 00:25:00 --action nothing
+    python timer_daemon.py add updates 01:00:00 --action restart --cue 23:alarm.mp3:loop
+    python timer_daemon.py list
+    python timer_daemon.py cancel pomodoro
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import selectors
+import socket
+import sys
+
+from actions import ActionExecutor, DryRunBackend
+from config import ConfigStore
+from countdown import CountdownEngine, format_hms, monotonic_clock, parse_hms
+from instance import runtime_path, socket_alive
+
+
+def socket_path():
+    """Per-user path of the daemon's control socket"""
+    return runtime_path("shutaap-%d.sock" % os.getuid())
+
+
+def cue_from_json(data):
+    """
+    A cue as a request sends it: [seconds, sound, loop].
+
+    Raises:
+        ValueError: if data is not a valid cue.
+    """
+    if not isinstance(data, list) or len(data) != 3:
+        raise ValueError(f"cue must be [seconds, sound, loop]: {data!r}")
+    seconds, sound, loop = data
+    if isinstance(seconds, bool) or not isinstance(seconds, int) or seconds < 0:
+        raise ValueError(f"invalid cue seconds: {data!r}")
+    if not isinstance(sound, str) or not sound:
+        raise ValueError(f"invalid cue sound: {data!r}")
+    if not isinstance(loop, bool):
+        raise ValueError(f"invalid cue loop: {data!r}")
+    return seconds, sound, loop
+
+
+class Timer:
+    def __init__(self, name, seconds, action=None, cues=(), clock=monotonic_clock):
+        self.name = name
+        self.action = action
+        # (seconds before the deadline, sound name, loop)
+        self.cues = sorted(cues, reverse=True)
+        self.engine = CountdownEngine(clock)
+        self.engine.start(seconds)
+        self.generation = 0
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "remaining": format_hms(self.engine.remaining_seconds()),
+            "action": self.action,
+            "cues": [list(cue) for cue in self.cues],
+        }
+
+
+class TimerScheduler:
+    """
+    Named timers in a heap keyed by the time of their next event.
+
+    Changing a timer bumps its generation instead of searching the heap;
+    entries of older generations are discarded when they reach the top.
+    """
+    FINISH = None
+
+    def __init__(self, clock=monotonic_clock):
+        self.clock = clock
+        self.timers = {}
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def add(self, name, seconds, action=None, cues=()):
+        if name in self.timers:
+            raise ValueError(f"timer {name!r} already exists")
+        timer = Timer(name, seconds, action, cues, self.clock)
+        self._schedule(timer)
+        self.timers[name] = timer
+        return timer
+
+    def extend(self, name, seconds):
+        """Move a timer's deadline by seconds, re-arming cues it moves back over"""
+        timer = self._get(name)
+        timer.engine.start(timer.engine.remaining() + seconds)
+        timer.generation += 1
+        self._schedule(timer)
+        return timer
+
+    def cancel(self, name):
+        timer = self._get(name)
+        del self.timers[name]
+        timer.generation += 1
+        return timer
+
+    def _get(self, name):
+        try:
+            return self.timers[name]
+        except KeyError:
+            raise ValueError(f"no timer named {name!r}") from None
+
+    def _schedule(self, timer):
+        now = self.clock()
+        deadline = timer.engine.deadline
+        events = [(deadline - cue[0], cue) for cue in timer.cues if deadline - cue[0] >= now]
+        events.append((deadline, self.FINISH))
+        # Nothing is pushed unless every event could be computed
+        for at, cue in events:
+            heapq.heappush(self._heap, (at, next(self._sequence), timer.name, timer.generation, cue))
+
+    def _discard_stale(self):
+        while self._heap:
+            _, _, name, generation, _ = self._heap[0]
+            timer = self.timers.get(name)
+            if timer is not None and timer.generation == generation:
+                return
+            heapq.heappop(self._heap)
+
+    def next_event_in(self):
+        """Seconds until the earliest event, or None when nothing is scheduled"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Remove and return every (timer, cue) that is due; cue is FINISH at the deadline"""
+        due = []
+        now = self.clock()
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, name, _, cue = heapq.heappop(self._heap)
+            timer = self.timers[name]
+            if cue is self.FINISH:
+                del self.timers[name]
+            due.append((timer, cue))
+
+
+class TimerDaemon:
+    """Serve the control socket and fire timer events as they come due"""
+    # Re-check the clock at least this often so a suspend is noticed promptly
+    MAX_SLEEP = 60.0
+
+    def __init__(self, path=None, backend=None, config_store=None, clock=monotonic_clock):
+        self.path = path or socket_path()
+        self.scheduler = TimerScheduler(clock)
+        self.backend = backend
+        if config_store is None:
+            config_store = ConfigStore()
+            config_store.load()
+        # Source of the pre-action hooks
+        self.config_store = config_store
+        self.audio = None
+        self.wakeups = 0
+        self.running = False
+
+    def serve_forever(self):
+        """
+        Raises:
+            OSError: if another daemon is serving the socket already.
+        """
+        if socket_alive(self.path):
+            raise OSError(f"a daemon is already serving {self.path}")
+        if os.path.exists(self.path):
+            # Left behind by a daemon that did not exit cleanly
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+        self.running = True
+        try:
+            while self.running:
+                timeout = self.scheduler.next_event_in()
+                timeout = self.MAX_SLEEP if timeout is None else min(timeout, self.MAX_SLEEP)
+                ready = selector.select(timeout)
+                self.wakeups += 1
+                if ready:
+                    connection, _ = server.accept()
+                    with connection:
+                        self.handle(connection)
+                self.fire_due()
+        finally:
+            selector.close()
+            server.close()
+            os.unlink(self.path)
+            if self.audio is not None:
+                self.audio.shutdown()
+
+    def handle(self, connection):
+        connection.settimeout(2.0)
+        try:
+            with connection.makefile("rwb") as stream:
+                request = json.loads(stream.readline() or b"{}")
+                response = self.dispatch(request)
+                stream.write(json.dumps(response).encode() + b"\n")
+        except (OSError, ValueError) as e:
+            print(f"Error: bad request: {e}")
+
+    def dispatch(self, request):
+        command = request.get("command")
+        try:
+            if command == "add":
+                cues = request.get("cues", [])
+                if not isinstance(cues, list):
+                    raise ValueError(f"cues must be a list: {cues!r}")
+                cues = [cue_from_json(cue) for cue in cues]
+                timer = self.scheduler.add(request["name"], request["seconds"], request.get("action"), cues)
+                if cues:
+                    self.start_audio()
+                return {"ok": True, "timer": timer.describe()}
+            if command == "extend":
+                timer = self.scheduler.extend(request["name"], request["seconds"])
+                # Re-armed loops start again when their cue comes round
+                self.stop_loops(timer, timer.engine.remaining())
+                return {"ok": True, "timer": timer.describe()}
+            if command == "cancel":
+                timer = self.scheduler.cancel(request["name"])
+                self.stop_loops(timer)
+                return {"ok": True}
+            if command == "list":
+                return {"ok": True, "timers": [timer.describe() for timer in self.scheduler.timers.values()],
+                        "wakeups": self.wakeups}
+            if command == "quit":
+                self.running = False
+                return {"ok": True}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": False, "error": f"unknown command {command!r}"}
+
+    def fire_due(self):
+        for timer, cue in self.scheduler.pop_due():
+            if cue is TimerScheduler.FINISH:
+                print(f"Shutaap: timer {timer.name} finished")
+                self.stop_loops(timer)
+                if timer.action is not None:
+                    self.run_action(timer)
+            elif self.audio is not None:
+                _, sound, loop = cue
+                self.audio.play(sound, loop=loop, tag=timer.name)
+
+    def run_action(self, timer):
+        """Run the configured pre-action hooks and then the timer's action, on a worker thread"""
+        self.config_store.reload_if_changed()
+        config = self.config_store.config
+        executor = ActionExecutor(self.backend)
+        for problem in executor.configure(timer.action, config.hooks, config.hook_deadline,
+                                          config.hook_workers).problems:
+            print(f"Error: {problem}")
+        # Requests keep being served while it runs
+        executor.execute(lambda result: result.report())
+
+    def start_audio(self):
+        """Open the mixer the first time a timer with sound cues is added"""
+        if self.audio is None:
+            from audio import AudioThread, SoundBank
+            base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+            self.audio = AudioThread(SoundBank(os.path.join(base_path, "sounds")))
+            self.audio.start()
+
+    def stop_loops(self, timer, remaining=None):
+        """
+        Stop the loops this timer started, leaving other timers' sounds
+        playing. With remaining, only the loops of cues that are ahead again.
+        """
+        if self.audio is not None:
+            for offset, sound, loop in timer.cues:
+                if loop and (remaining is None or offset <= remaining):
+                    self.audio.stop(sound, tag=timer.name)
+
+
+def send(request, path=None):
+    """Send one request to the running daemon and return its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path or socket_path())
+        with client.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def parse_cue(text):
+    """Parse 'SECONDS:SOUND[:loop]' into a cue tuple"""
+    parts = text.split(":")
+    if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] != "loop"):
+        raise argparse.ArgumentTypeError(f"expected SECONDS:SOUND[:loop], got {text!r}")
+    return int(parts[0]), parts[1], len(parts) == 3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several Shutaap timers in one background process")
+    parser.add_argument("--socket", help="control socket path (default: %(default)s)", default=socket_path())
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the daemon in the foreground")
+    serve.add_argument("--dry-run", action="store_true", help="print system actions instead of running them")
+    add = commands.add_parser("add", help="add a named timer")
+    add.add_argument("name")
+    add.add_argument("duration", help="HH:MM:SS")
+    add.add_argument("--action", choices=("shutdown", "restart", "sleep", "nothing"), default="nothing")
+    add.add_argument("--cue", type=parse_cue, action="append", default=[],
+                     help="sound cue as SECONDS:SOUND[:loop], e.g. 23:alarm.mp3:loop")
+    extend = commands.add_parser("extend", help="add time to a timer")
+    extend.add_argument("name")
+    extend.add_argument("duration", help="HH:MM:SS")
+    cancel = commands.add_parser("cancel", help="cancel a timer")
+    cancel.add_argument("name")
+    commands.add_parser("list", help="list running timers")
+    commands.add_parser("quit", help="stop the daemon")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            TimerDaemon(args.socket, backend=DryRunBackend() if args.dry_run else None).serve_forever()
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+
+    request = {"command": args.command}
+    if args.command in ("add", "extend", "cancel"):
+        request["name"] = args.name
+    if args.command in ("add", "extend"):
+        try:
+            request["seconds"] = parse_hms(args.duration)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command == "add":
+        request["action"] = None if args.action == "nothing" else args.action
+        request["cues"] = args.cue
+    try:
+        response = send(request, args.socket)
+    except OSError as e:
+        print(f"Error: daemon not reachable at {args.socket}: {e}")
+        return 1
+    print(json.dumps(response, indent=4))
+    return 0 if response.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Opt-in event tracing in the Chrome trace-event format.
+
+Events go into a fixed-size ring buffer, so a long session keeps only the
+most recent ones. Instrumented code checks `tracer.enabled` before building
+an event, which makes the disabled tracer cost one attribute lookup. The
+dump opens in chrome://tracing or https://ui.perfetto.dev.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class Tracer:
+    enabled = True
+    CAPACITY = 100000
+
+    def __init__(self, capacity=CAPACITY, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.events = deque(maxlen=capacity)
+        self.thread_names = {}
+
+    def now(self):
+        return self.clock()
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def instant(self, name, category, **args):
+        """Record an event with no duration"""
+        self.events.append(("i", name, category, self.clock(), 0.0, self._tid(), args))
+
+    def complete(self, name, category, start, end=None, **args):
+        """Record an event that ran from start to end (default: now)"""
+        if end is None:
+            end = self.clock()
+        self.events.append(("X", name, category, start, end - start, self._tid(), args))
+
+    def to_chrome(self):
+        """The buffered events as a Chrome trace-event document"""
+        pid = os.getpid()
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        for phase, name, category, at, duration, tid, args in list(self.events):
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": phase,
+                "ts": round((at - self.origin) * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            if phase == "X":
+                event["dur"] = round(duration * 1e6, 3)
+            else:
+                event["s"] = "t"
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_chrome(), file)
+
+
+class NullTracer:
+    """Stand-in used when tracing is off; callers skip their events"""
+    enabled = False
+
+    def now(self):
+        return 0.0
+
+    def instant(self, name, category, **args):
+        pass
+
+    def complete(self, name, category, start, end=None, **args):
+        pass
+
+
+NULL_TRACER = NullTracer()